@@ -1,7 +1,18 @@
+import os
 import re
-import pandas as pd
+import sys
+import csv
+import glob
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import pdfplumber
 import logging
+import models
+from scoring import AnswerKeyIndex, score_mcq, score_sa, combined_summary
 
 # Set up logging
 logging.basicConfig(level=logging.INFO,
@@ -133,6 +144,8 @@ class JEEExamParser:
             logger.error("No data to export")
             return False
         try:
+            # Only the CSV export needs pandas
+            import pandas as pd
             df = pd.DataFrame(self.exam_data)
             # Expected column format
             columns = ["type", "question_id", "option_1_id", "option_2_id",
@@ -152,12 +165,218 @@ class JEEExamParser:
             logger.error(f"Error exporting to CSV: {e}")
             return False
 
+# Columns of the batch grader's output, one row per sheet
+RESULT_FIELDS = ["file", "sha256", "total_score", "correct_questions", "incorrect_questions", "skipped_questions",
+                 "dropped_questions", "total_questions", "mcq_score", "sa_score", "mcq_found", "sa_found", "error"]
+
+# Set in each grading worker by _init_grader
+_answer_index = None
+_expected_questions = None
+
+
+def find_pdfs(inputs: list) -> list:
+    """Expand directories (searched recursively) and glob patterns into a sorted, de-duplicated list of PDFs."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                paths += [os.path.join(root, name) for name in names if name.lower().endswith(".pdf")]
+        else:
+            paths += [path for path in glob.glob(item, recursive=True) if os.path.isfile(path)]
+    return sorted(set(paths))
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content, the same digest the API keys its result cache on."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_jsonl(path: str) -> bool:
+    return path.lower().endswith((".jsonl", ".json"))
+
+
+def load_done(output: str) -> set:
+    """Digests of the sheets an earlier run already graded into `output` (failed rows are retried)."""
+    if not os.path.exists(output):
+        return set()
+    with open(output, "r", newline="") as f:
+        if _is_jsonl(output):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    return {row["sha256"] for row in rows if row.get("sha256") and not row.get("error")}
+
+
+def load_answer_key(path: str, id_field: str = None, answer_field: str = None, sa_tolerance: float = 0.0):
+    """Load and compile an answer key; returns (AnswerKeyIndex, question count, id_field, answer_field).
+
+    Without explicit field names, a key whose entries have "question_id"
+    (like answer_key.json) is read with question_id / correct_option_id,
+    any other with id / correct_option. Raises ValueError for a key that
+    cannot be read or compiled.
+    """
+    try:
+        with open(path, "r") as f:
+            answer_key = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Could not read answer key {path}: {e}") from e
+    if not isinstance(answer_key, list) or not answer_key:
+        raise ValueError(f"Answer key {path} must be a non-empty JSON list")
+    if id_field is None and isinstance(answer_key[0], dict) and "question_id" in answer_key[0]:
+        id_field, answer_field = "question_id", answer_field or "correct_option_id"
+    id_field, answer_field = id_field or "id", answer_field or "correct_option"
+    if not all(isinstance(item, dict) and id_field in item and answer_field in item for item in answer_key):
+        raise ValueError(f"Every entry of answer key {path} needs {id_field!r} and {answer_field!r} fields")
+    try:
+        index = AnswerKeyIndex(answer_key, id_field, answer_field, sa_tolerance)
+    except Exception as e:
+        raise ValueError(f"Could not compile answer key {path}: {e}") from e
+    return index, len(answer_key), id_field, answer_field
+
+
+def _init_grader(answer_key_path: str, id_field: str, answer_field: str, sa_tolerance: float):
+    global _answer_index, _expected_questions
+    # models logs every parse at INFO; with thousands of sheets that drowns the progress line
+    logging.getLogger("models").setLevel(logging.WARNING)
+    _answer_index, _expected_questions, _, _ = load_answer_key(answer_key_path, id_field, answer_field,
+                                                                sa_tolerance)
+
+
+def grade_sheet(job: tuple) -> dict:
+    """Parse and score one (path, digest) in a grading worker; errors are reported in the row."""
+    path, digest = job
+    row = {"file": path, "sha256": digest, "error": ""}
+    try:
+        with open(path, "rb") as f:
+            records = models.parse_all_records(f.read(), _expected_questions)
+        mcq_data, sa_data = records["mcq"], records["sa"]
+        mcq_scores = score_mcq(_answer_index, [q.question_id for q in mcq_data],
+                               [q.chosen_option_id for q in mcq_data])
+        sa_scores = score_sa(_answer_index, [q for q, _ in sa_data], [a for _, a in sa_data])
+        summary = combined_summary(mcq_scores, sa_scores)
+        row.update({field: summary.get(field, 0) for field in RESULT_FIELDS[2:8]})
+        row.update(mcq_score=mcq_scores.total_score, sa_score=sa_scores.total_score,
+                   mcq_found=len(mcq_data), sa_found=len(sa_data))
+    except Exception as e:
+        row["error"] = str(e) or type(e).__name__
+    return row
+
+
+class ResultWriter:
+    """Appends result rows to a CSV or JSON Lines file (chosen by extension), flushing after each row."""
+
+    def __init__(self, path: str):
+        self.jsonl = _is_jsonl(path)
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="")
+        self._csv = None
+        if not self.jsonl:
+            self._csv = csv.DictWriter(self._file, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+            if new:
+                self._csv.writeheader()
+
+    def write(self, row: dict):
+        if self.jsonl:
+            self._file.write(json.dumps({field: row.get(field) for field in RESULT_FIELDS}) + "\n")
+        else:
+            self._csv.writerow(row)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _show_progress(done: int, total: int, failed: int, started: float):
+    """Redraw one progress line on a terminal; otherwise print a line every 5% of the batch."""
+    tty = sys.stderr.isatty()
+    if not tty and done != total and done % max(1, total // 20):
+        return
+    rate = done / max(time.perf_counter() - started, 1e-9)
+    print(f"{chr(13) if tty else ''}{done}/{total} sheets graded, {failed} failed, {rate:.1f} sheets/s",
+          end="\n" if done == total or not tty else "", file=sys.stderr, flush=True)
+
+
+def grade_batch(inputs: list, answer_key_path: str, output: str, workers: int = None, sa_tolerance: float = 0.0,
+                progress: bool = True, id_field: str = None, answer_field: str = None) -> dict:
+    """Parse and score every PDF in `inputs` across a process pool, appending one row per sheet to `output`.
+
+    Sheets whose content was already graded into `output`, and duplicates
+    within this batch, are skipped, so an interrupted regrade can simply be
+    rerun. The answer key is checked (see load_answer_key) before any
+    worker starts. Returns counts, the elapsed time and the throughput.
+    """
+    _, _, id_field, answer_field = load_answer_key(answer_key_path, id_field, answer_field, sa_tolerance)
+    paths = find_pdfs(inputs)
+    done = load_done(output)
+    jobs = []
+    for path in paths:
+        digest = file_digest(path)
+        if digest not in done:
+            done.add(digest)
+            jobs.append((path, digest))
+    logger.info(f"Grading {len(jobs)} of {len(paths)} PDFs ({len(paths) - len(jobs)} already graded or duplicates)")
+
+    workers = workers or os.cpu_count() or 1
+    failed = 0
+    started = time.perf_counter()
+    if jobs:
+        context = multiprocessing.get_context("spawn")
+        with ResultWriter(output) as writer, ProcessPoolExecutor(
+                min(workers, len(jobs)), mp_context=context, initializer=_init_grader,
+                initargs=(answer_key_path, id_field, answer_field, sa_tolerance)) as pool:
+            for n, row in enumerate(pool.map(grade_sheet, jobs), 1):
+                writer.write(row)
+                if row["error"]:
+                    failed += 1
+                    logger.warning(f"Could not grade {row['file']}: {row['error']}")
+                if progress:
+                    _show_progress(n, len(jobs), failed, started)
+    seconds = time.perf_counter() - started
+    return {"found": len(paths), "skipped": len(paths) - len(jobs), "graded": len(jobs) - failed, "failed": failed,
+            "seconds": round(seconds, 3), "sheets_per_second": round(len(jobs) / seconds, 2) if jobs else None}
+
+
 if __name__ == "__main__":
-    # Set file paths here
-    pdf_path = "/Users/priyanshubadal/Downloads/AADITYA PASSI_250227_090945.pdf"  # Change this
-    csv_path = "/Users/priyanshubadal/Desktop/CheckMarksAPI/MCQ.csv" # Change this
-
-    parser = JEEExamParser(pdf_path, csv_path)
-    parser.parse_exam_pdf()
-    parser.export_to_csv()
-    logger.info("Process completed")
\ No newline at end of file
+    cli = argparse.ArgumentParser(description="Parse JEE response sheet PDFs.")
+    commands = cli.add_subparsers(dest="command", required=True)
+
+    grade = commands.add_parser("grade", help="grade a folder of sheets against an answer key")
+    grade.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    grade.add_argument("--answer-key", required=True,
+                       help="answer key JSON (a list of id / correct_option, or question_id / correct_option_id)")
+    grade.add_argument("--id-field", help="question ID field of the answer key entries (default: detected)")
+    grade.add_argument("--answer-field", help="correct answer field of the answer key entries (default: detected)")
+    grade.add_argument("--output", default="scores.csv", help="results file, .csv or .jsonl (default scores.csv)")
+    grade.add_argument("--workers", type=int, default=None, help="parse processes (default: all cores)")
+    grade.add_argument("--sa-tolerance", type=float, default=float(os.environ.get("ANSWER_KEY_SA_TOLERANCE", "0")))
+    grade.add_argument("--quiet", action="store_true", help="no progress line")
+
+    export = commands.add_parser("csv", help="export one sheet's MCQ responses to CSV")
+    export.add_argument("pdf")
+    export.add_argument("output")
+
+    args = cli.parse_args()
+    if args.command == "grade":
+        try:
+            stats = grade_batch(args.inputs, args.answer_key, args.output, args.workers, args.sa_tolerance,
+                                progress=not args.quiet, id_field=args.id_field, answer_field=args.answer_field)
+        except ValueError as e:
+            cli.error(str(e))
+        logger.info(f"Graded {stats['graded']} sheets ({stats['failed']} failed, {stats['skipped']} skipped) "
+                    f"in {stats['seconds']}s: {stats['sheets_per_second']} sheets/s; results in {args.output}")
+        sys.exit(1 if stats["failed"] else 0)
+    else:
+        parser = JEEExamParser(args.pdf, args.output)
+        parser.parse_exam_pdf()
+        parser.export_to_csv()
+        logger.info("Process completed")
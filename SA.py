@@ -1,28 +1,12 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File
-import json
-import tempfile
-from models import extract_sa_from_pdf
+from models import parse_sa_records, DocumentRejected, PARSE_LIMITS
+from ingest import ingest_upload, is_document_name
+from scoring import score_sa
+from answer_keys import index_from_file
 
 sa_router = APIRouter()
 
-# Load answer key
-with open("answer_key.json", "r") as file:
-    answer_key = json.load(file)
-
-# Convert answer key to a dictionary for faster lookup
-answer_dict = {q["question_id"]: q["correct_option_id"] for q in answer_key}
-
-def match_answer(user_answer, correct_answer):
-    """
-    Matches answers, considering case insensitivity and numeric conversion.
-    """
-    if correct_answer in ["DROP", ""]:  # Ignore invalid answers
-        return False
-
-    try:
-        return float(user_answer) == float(correct_answer)
-    except ValueError:
-        return user_answer.strip().lower() == correct_answer.strip().lower()
+ANSWER_KEY_PATH = "answer_key.json"
 
 @sa_router.post("/extract/sa")
 async def evaluate_sa(file: UploadFile = File(...)):
@@ -33,80 +17,27 @@ async def evaluate_sa(file: UploadFile = File(...)):
     - Incorrect answer: -1 mark
     - Unattempted: 0 marks
     """
-    # Validate file is a PDF
-    if not file.filename.endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="File must be a PDF")
+    # Validate file is a response sheet
+    if not is_document_name(file.filename):
+        raise HTTPException(status_code=400, detail="File must be a PDF or HTML response sheet")
 
-    # Save uploaded file temporarily
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
     try:
-        contents = await file.read()
-        temp_file.write(contents)
-        temp_file.close()
-
-        # Process the PDF
-        sa_data = extract_sa_from_pdf(temp_file.name)
-
-        total_score = 0
-        correct_count = 0
-        incorrect_count = 0
-        skipped_count = 0
-        results = []
-
-        # Process each question
-        for _, row in sa_data.iterrows():
-            q_id = str(row.get("question_id"))
-            given_answer = str(row.get("answer")).strip()
-
-            # Skip questions not in answer key
-            if q_id not in answer_dict:
-                continue
-
-            correct_answer = str(answer_dict.get(q_id)).strip()
-
-            # Create detailed result for this question
-            result = {
-                "type": "sa",
-                "question_id": q_id,
-                "given_answer": given_answer,
-                "correct_answer": correct_answer,
-                "status": "",
-                "points": 0
-            }
-
-            # Check answer status
-            if given_answer.upper() == "NULL" or not given_answer:
-                skipped_count += 1
-                result["status"] = "Not Answered"
-            elif given_answer == correct_answer:
-                correct_count += 1
-                total_score += 4
-                result["status"] = "Correct"
-                result["points"] = 4
-            else:
-                incorrect_count += 1
-                total_score -= 1
-                result["status"] = "Incorrect"
-                result["points"] = -1
+        # Process the PDF straight from the ingested upload
+        sa_data = parse_sa_records(await ingest_upload(file, PARSE_LIMITS))
 
-            results.append(result)
+        # Compiled on first use and again only when the key file changes
+        answer_index = index_from_file(ANSWER_KEY_PATH, "question_id", "correct_option_id")
+        scores = score_sa(answer_index, [q for q, _ in sa_data], [a for _, a in sa_data],
+                          case_sensitive=True)
 
         # Return formatted response matching MCQ format
         return {
-            "sa_data": results,
+            "sa_data": scores.records(include_type=True),
             "filename": file.filename,
-            "score_summary": {
-                "correct_questions": correct_count,
-                "incorrect_questions": incorrect_count,
-                "skipped_questions": skipped_count,
-                "total_questions": correct_count + incorrect_count + skipped_count,
-                "total_score": total_score,
-                "scoring_system": "+4 for correct, -1 for incorrect, 0 for skipped"
-            }
+            "score_summary": scores.summary()
         }
 
+    except DocumentRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
-    finally:
-        if temp_file.name and os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
@@ -0,0 +1,445 @@
+import os
+import json
+import time
+import struct
+import asyncio
+import hashlib
+import logging
+import tempfile
+import numpy as np
+from scoring import AnswerKeyIndex
+from singleflight import SingleFlight
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+NOT_MODIFIED = object()
+
+
+class DriveAnswerKeySource:
+    """Fetch answer keys from Google Drive, one file id per exam date."""
+
+    def __init__(self, file_map: dict):
+        self.file_map = file_map
+
+    def dates(self) -> list:
+        return sorted(self.file_map)
+
+    def fetch(self, date: str, etag: str = None):
+        """Return (answer_key, etag), or (NOT_MODIFIED, etag) when unchanged."""
+        file_id = self.file_map.get(date)
+        if not file_id:
+            raise ValueError(f"No answer key mapped for date: {date}")
+        import requests
+        url = f"https://drive.google.com/uc?export=download&id={file_id}"
+        headers = {"If-None-Match": etag} if etag else {}
+        response = requests.get(url, headers=headers, timeout=30)
+        if response.status_code == 304:
+            return NOT_MODIFIED, etag
+        response.raise_for_status()
+        return response.json(), response.headers.get("ETag")
+
+
+class HttpAnswerKeySource:
+    """Fetch answer keys from `<base_url>/<date>.json`, e.g. a local stand-in server."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+
+    def dates(self) -> list:
+        # The server cannot be listed; keys are fetched on first use
+        return []
+
+    def fetch(self, date: str, etag: str = None):
+        """Return (answer_key, etag), or (NOT_MODIFIED, etag) when unchanged."""
+        import requests
+        headers = {"If-None-Match": etag} if etag else {}
+        response = requests.get(f"{self.base_url}/{date}.json", headers=headers, timeout=30)
+        if response.status_code == 304:
+            return NOT_MODIFIED, etag
+        if response.status_code == 404:
+            raise ValueError(f"No answer key mapped for date: {date}")
+        response.raise_for_status()
+        return response.json(), response.headers.get("ETag")
+
+
+class LocalAnswerKeySource:
+    """Read answer keys from `<directory>/<date>.json`; the file mtime acts as the ETag."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def dates(self) -> list:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    def fetch(self, date: str, etag: str = None):
+        """Return (answer_key, etag), or (NOT_MODIFIED, etag) when unchanged."""
+        path = os.path.join(self.directory, f"{os.path.basename(date)}.json")
+        if not os.path.exists(path):
+            raise ValueError(f"No answer key mapped for date: {date}")
+        stat = os.stat(path)
+        current = f"{stat.st_mtime_ns}-{stat.st_size}"
+        if etag == current:
+            return NOT_MODIFIED, etag
+        with open(path, "r") as f:
+            return json.load(f), current
+
+
+_INDEX_MAGIC = b"AKIDX001"
+_ALIGN = 64
+
+
+def _write_compiled(path: str, fingerprint: str, indexes: dict):
+    """Write every date's index arrays into one file, replacing `path` atomically."""
+    header = {"fingerprint": fingerprint, "dates": {}}
+    chunks = []
+    offset = 0
+    for date, index in indexes.items():
+        layout = header["dates"][date] = {"sa_tolerance": index.sa_tolerance, "arrays": {}}
+        for name, array in index.arrays().items():
+            array = np.ascontiguousarray(array)
+            layout["arrays"][name] = [offset, array.dtype.str, len(array)]
+            data = array.tobytes()
+            padding = -len(data) % _ALIGN
+            chunks.append(data + b"\0" * padding)
+            offset += len(data) + padding
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b" " * (-(len(_INDEX_MAGIC) + 8 + len(header_bytes)) % _ALIGN)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".answer_keys-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_INDEX_MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes)
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file private; other worker users only need to read it
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _map_compiled(path: str):
+    """Memory-map a compiled file; returns (fingerprint, {date: AnswerKeyIndex over read-only views})."""
+    mapped = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(mapped[:len(_INDEX_MAGIC)]) != _INDEX_MAGIC:
+        raise ValueError(f"{path} is not a compiled answer key index")
+    header_len = struct.unpack("<Q", bytes(mapped[len(_INDEX_MAGIC):len(_INDEX_MAGIC) + 8]))[0]
+    data_start = len(_INDEX_MAGIC) + 8 + header_len
+    header = json.loads(bytes(mapped[len(_INDEX_MAGIC) + 8:data_start]))
+    indexes = {}
+    for date, layout in header["dates"].items():
+        arrays = {name: np.frombuffer(mapped, dtype=np.dtype(dtype), count=count, offset=data_start + offset)
+                  for name, (offset, dtype, count) in layout["arrays"].items()}
+        indexes[date] = AnswerKeyIndex.from_arrays(arrays, layout["sa_tolerance"])
+    return header["fingerprint"], indexes
+
+
+class CompiledAnswerKeys:
+    """Every answer key in a directory, compiled into one memory-mapped index file.
+
+    Each `<date>.json` is compiled to an AnswerKeyIndex and all of them are
+    written to a single file (`path`) of raw numpy arrays. Worker processes
+    map that file read-only, so the OS shares one copy of the pages instead
+    of each worker holding its own.
+
+    `refresh` fingerprints the directory (names, mtimes, sizes) at most
+    every `check_interval` seconds. When a key file changed, the first
+    process to notice recompiles into a temporary file and renames it over
+    `path`; every process then swaps in the new mapping in one assignment,
+    so a request sees either the old or the new set of keys, never a mix.
+    If a key file cannot be read (e.g. half written), the current mapping
+    stays in place and the next check retries.
+    """
+
+    def __init__(self, directory: str, path: str = None, id_field: str = "id",
+                 answer_field: str = "correct_option", sa_tolerance: float = 0.0, check_interval: float = 2.0):
+        self.directory = directory
+        self.path = path or os.path.join(directory, ".answer_keys.idx")
+        self.id_field = id_field
+        self.answer_field = answer_field
+        self.sa_tolerance = sa_tolerance
+        self.check_interval = check_interval
+        self._fingerprint = None
+        self._indexes = {}
+        self._next_check = 0.0
+        self.reloads = 0
+
+    def _source_fingerprint(self) -> str:
+        entries = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((name, stat.st_mtime_ns, stat.st_size))
+        settings = (self.id_field, self.answer_field, self.sa_tolerance)
+        return hashlib.sha256(json.dumps([settings, entries]).encode()).hexdigest()
+
+    def _compile(self) -> dict:
+        indexes = {}
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name), "r") as f:
+                    indexes[name[:-len(".json")]] = AnswerKeyIndex(json.load(f), self.id_field, self.answer_field,
+                                                                   self.sa_tolerance)
+        return indexes
+
+    def due(self) -> bool:
+        return time.monotonic() >= self._next_check
+
+    def expire(self):
+        """Make the next `refresh` check the directory regardless of the interval."""
+        self._next_check = 0.0
+
+    def refresh(self):
+        """Recompile and/or remap if the key files changed since the last check (blocking)."""
+        if not self.due():
+            return
+        self._next_check = time.monotonic() + self.check_interval
+        if not os.path.isdir(self.directory):
+            return
+        fingerprint = self._source_fingerprint()
+        if fingerprint == self._fingerprint:
+            return
+        try:
+            try:
+                on_disk, indexes = _map_compiled(self.path)
+            except (OSError, ValueError):
+                on_disk = None
+            if on_disk != fingerprint:
+                compiled = self._compile()
+                try:
+                    _write_compiled(self.path, fingerprint, compiled)
+                    on_disk, indexes = _map_compiled(self.path)
+                    logger.info(f"Compiled {len(compiled)} answer keys into {self.path}")
+                except OSError as e:
+                    # Read-only deployment: keep a private in-memory copy instead of a shared one
+                    logger.warning(f"Could not write {self.path} ({e}); answer key index is not shared")
+                    indexes = compiled
+        except Exception as e:
+            logger.error(f"Keeping the previous answer key index; reload failed: {e}")
+            return
+        self._fingerprint, self._indexes = fingerprint, indexes
+        self.reloads += 1
+
+    def index(self, date: str):
+        """The compiled index for `date`, or None."""
+        return self._indexes.get(date)
+
+    def dates(self) -> list:
+        return sorted(self._indexes)
+
+
+class _Entry:
+    __slots__ = ("data", "etag", "fetched_at", "index")
+
+    def __init__(self, data, etag, fetched_at):
+        self.data = data
+        self.etag = etag
+        self.fetched_at = fetched_at
+        self.index = None
+
+
+class AnswerKeyRegistry:
+    """In-process answer key cache.
+
+    Each key is loaded once and served from memory. Once an entry is older
+    than `ttl` seconds it is still served, while a background task
+    revalidates it against the source (ETag / mtime). Concurrent misses for
+    the same date share a single fetch.
+
+    With a `compiled` index, both `get` and `get_index` first let it check
+    the key files; when it reloads, the cached raw keys are dropped too, so
+    a request never pairs a new index with an old key (or the reverse).
+    """
+
+    def __init__(self, source, ttl: float = 300.0, id_field: str = "id", answer_field: str = "correct_option",
+                 sa_tolerance: float = 0.0, compiled: CompiledAnswerKeys = None):
+        self.source = source
+        self.ttl = ttl
+        self.id_field = id_field
+        self.answer_field = answer_field
+        self.sa_tolerance = sa_tolerance
+        self.compiled = compiled
+        self._entries = {}
+        self._inflight = SingleFlight()
+        self._refreshing = set()
+        self._tasks = set()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    async def get(self, date: str):
+        """Return the answer key for `date`, fetching it on first use."""
+        await self._refresh_compiled()
+        entry = self._entries.get(date)
+        if entry is not None:
+            self.hits += 1
+            if time.monotonic() - entry.fetched_at > self.ttl:
+                self._schedule_refresh(date)
+            return entry.data
+
+        self.misses += 1
+        return await self._inflight.do(date, lambda: self._load(date))
+
+    async def get_index(self, date: str) -> AnswerKeyIndex:
+        """Return the answer key for `date` pre-indexed for scoring.
+
+        Dates present in the compiled (shared) index are served from it.
+        """
+        if self.compiled is not None:
+            await self._refresh_compiled()
+            index = self.compiled.index(date)
+            if index is not None:
+                return index
+
+        data = await self.get(date)
+        entry = self._entries.get(date)
+        if entry is None or entry.data is not data:
+            return AnswerKeyIndex(data, self.id_field, self.answer_field, self.sa_tolerance)
+        if entry.index is None:
+            entry.index = AnswerKeyIndex(data, self.id_field, self.answer_field, self.sa_tolerance)
+        return entry.index
+
+    async def _refresh_compiled(self):
+        if self.compiled is None or not self.compiled.due():
+            return
+        reloads = self.compiled.reloads
+        with span("answer_key_fetch"):
+            await asyncio.to_thread(self.compiled.refresh)
+        if self.compiled.reloads != reloads and self._entries:
+            logger.info("Answer key files changed; dropping the cached raw keys")
+            self._entries.clear()
+
+    async def _load(self, date: str):
+        with span("answer_key_fetch"):
+            data, etag = await asyncio.to_thread(self.source.fetch, date, None)
+        self._entries[date] = _Entry(data, etag, time.monotonic())
+        logger.info(f"Loaded answer key for {date} with {len(data)} entries")
+        return data
+
+    def _schedule_refresh(self, date: str):
+        if date in self._refreshing:
+            return
+        self._refreshing.add(date)
+        task = asyncio.ensure_future(self._refresh(date))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, date: str):
+        entry = self._entries.get(date)
+        try:
+            if entry is None:
+                return
+            with span("answer_key_fetch"):
+                data, etag = await asyncio.to_thread(self.source.fetch, date, entry.etag)
+            self.refreshes += 1
+            if data is NOT_MODIFIED:
+                entry.fetched_at = time.monotonic()
+            else:
+                self._entries[date] = _Entry(data, etag, time.monotonic())
+                logger.info(f"Refreshed answer key for {date}")
+        except Exception as e:
+            # Keep serving the stale copy; the next request past the TTL retries
+            self.refresh_errors += 1
+            logger.warning(f"Error refreshing answer key for {date}: {e}")
+        finally:
+            self._refreshing.discard(date)
+
+    async def preload(self, dates: list = None) -> dict:
+        """Load and index the keys for `dates` (default: every date the source lists).
+
+        Returns {date: entries} for the keys that loaded and {date: error}
+        for the ones that did not; a failure is logged and the key is simply
+        fetched again on first use.
+        """
+        dates = self.source.dates() if dates is None else dates
+        loaded, failed = {}, {}
+        for date in dates:
+            try:
+                # The endpoints read the raw key as well as the index
+                loaded[date] = len(await self.get(date))
+                await self.get_index(date)
+            except Exception as e:
+                failed[date] = str(e)
+                logger.warning(f"Could not preload answer key for {date}: {e}")
+        return {"loaded": loaded, "failed": failed}
+
+    def invalidate(self, date: str = None):
+        """Drop one cached key, or all of them."""
+        if self.compiled is not None:
+            self.compiled.expire()
+        if date is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(date, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        now = time.monotonic()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "miss_rate": self.misses / total if total else 0.0,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "coalesced_misses": self._inflight.coalesced,
+            "compiled_dates": self.compiled.dates() if self.compiled is not None else None,
+            "compiled_reloads": self.compiled.reloads if self.compiled is not None else None,
+            "ttl_seconds": self.ttl,
+            "cached": {
+                date: {"entries": len(entry.data), "age_seconds": round(now - entry.fetched_at, 3)}
+                for date, entry in self._entries.items()
+            },
+        }
+
+
+_file_indexes = {}
+
+
+def index_from_file(path: str, id_field: str = "id", answer_field: str = "correct_option") -> AnswerKeyIndex:
+    """Compile a single answer key file, reusing the compiled index until the file changes."""
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cache_key = (os.path.abspath(path), id_field, answer_field)
+    cached = _file_indexes.get(cache_key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with open(path, "r") as f:
+        index = AnswerKeyIndex(json.load(f), id_field, answer_field)
+    _file_indexes[cache_key] = (stamp, index)
+    return index
+
+
+def registry_from_env(drive_map: dict) -> AnswerKeyRegistry:
+    """Build the registry selected by ANSWER_KEY_SOURCE (drive, local or http).
+
+    ANSWER_KEY_DRIVE_MAP (JSON, date -> Drive file id) extends `drive_map`.
+    For the local source every key in ANSWER_KEY_DIR is also compiled into
+    the shared index file ANSWER_KEY_INDEX_PATH.
+    """
+    kind = os.environ.get("ANSWER_KEY_SOURCE", "drive")
+    ttl = float(os.environ.get("ANSWER_KEY_TTL", "300"))
+    sa_tolerance = float(os.environ.get("ANSWER_KEY_SA_TOLERANCE", "0"))
+    compiled = None
+    if kind == "local":
+        directory = os.environ.get("ANSWER_KEY_DIR", "answer_key_files")
+        source = LocalAnswerKeySource(directory)
+        compiled = CompiledAnswerKeys(directory, os.environ.get("ANSWER_KEY_INDEX_PATH") or None,
+                                      sa_tolerance=sa_tolerance,
+                                      check_interval=float(os.environ.get("ANSWER_KEY_CHECK_INTERVAL", "2")))
+    elif kind == "http":
+        source = HttpAnswerKeySource(os.environ.get("ANSWER_KEY_URL", "http://127.0.0.1:8001"))
+    elif kind == "drive":
+        source = DriveAnswerKeySource({**drive_map, **json.loads(os.environ.get("ANSWER_KEY_DRIVE_MAP", "{}"))})
+    else:
+        raise ValueError(f"Unknown ANSWER_KEY_SOURCE: {kind}")
+    return AnswerKeyRegistry(source, ttl=ttl, sa_tolerance=sa_tolerance, compiled=compiled)
@@ -1,13 +1,27 @@
-from io import BytesIO
 import os
 import json
+import time
 import asyncio
-import requests
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.responses import JSONResponse
+import zipfile
+import statistics
+from typing import List
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from models import extract_mcq_from_pdf, extract_sa_from_pdf
+from answer_keys import registry_from_env
+from parse_executor import executor_from_env, ParseQueueFull
+from scoring import score_mcq, score_sa, combined_summary
+from result_cache import cache_from_env
+from ingest import Upload, ingest_upload, ingest_stream, ingest_text, is_document_name
+from singleflight import SingleFlight
+from jobs import job_queue_from_env, JobQueueFull
+from response_store import store_from_env, sheet_key
+from ranking import RankIndex
+from sample_sheet import SAMPLE_PDF, SAMPLE_MCQ, SAMPLE_SA
+from models import PARSE_LIMITS, DocumentRejected, plain_records, typed_records
+from metrics import REGISTRY, REQUEST_SECONDS, REQUESTS, Gauge, span, observe_stage, start_request, server_timing
+from instrumentation import TimedRoute, profiler_from_env
 import logging
 
 # Configure logging
@@ -23,10 +37,33 @@ ANSWER_KEY_DRIVE_MAP = {
     "04_04_24": "1-Etixccitmyanw18TkFToNu602MxsWBa"
 }
 
+answer_key_registry = registry_from_env(ANSWER_KEY_DRIVE_MAP)
+parse_executor = executor_from_env()
+result_cache = cache_from_env()
+parse_flights = SingleFlight()
+
+job_queue = job_queue_from_env(parse_executor.workers)
+response_store = store_from_env()
+rank_index = RankIndex()
+request_profiler = profiler_from_env()
+
+# Upper bound on PDFs per /grade/batch request (zip members included)
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "500"))
+# Parses one batch may have in flight; defaults to the number of parse workers
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "0")) or parse_executor.workers
+# Exam dates whose answer keys are loaded during warm-up (comma-separated); default: all the source lists
+WARMUP_ANSWER_KEYS = [d for d in os.environ.get("WARMUP_ANSWER_KEYS", "").split(",") if d] or None
+
+# Progress of the startup warm-up, reported by /ready
+warmup = {"status": "pending", "seconds": None, "steps": {}, "error": None}
+warmup_tasks = set()
+
 app = FastAPI(
     title="PDF Question Extractor API",
     description="API for extracting MCQ and Short Answer questions from PDF files"
 )
+# Routes registered below time their response serialization
+app.router.route_class = TimedRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -36,122 +73,317 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def get_answer_key_from_drive(file_id: str) -> dict:
-    url = f"https://drive.google.com/uc?export=download&id={file_id}"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
 
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    """Record request latency, and return the request's stage timings in a Server-Timing header.
+
+    With REQUEST_PROFILING enabled, a request sent with an X-Debug-Profile
+    header is also run under cProfile; the dump's path comes back in
+    X-Profile-File.
+    """
+    stages = start_request()
+    started = time.perf_counter()
+    profile_path = None
+    if request_profiler.wanted(request):
+        response, profile_path = await request_profiler.run(request, call_next)
+    else:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - started
+
+    route = request.scope.get("route")
+    labels = (request.method, getattr(route, "path", "unmatched"), str(response.status_code))
+    REQUEST_SECONDS.observe(elapsed, *labels)
+    REQUESTS.inc(*labels)
+    response.headers["Server-Timing"] = server_timing({**stages, "total": elapsed})
+    if profile_path:
+        response.headers["X-Profile-File"] = profile_path
+    return response
+
+
+@app.on_event("startup")
+async def start_warm_up():
+    # Runs in the background so the server is up (and /ready answers) while workers warm
+    task = asyncio.ensure_future(warm_up())
+    warmup_tasks.add(task)
+    task.add_done_callback(warmup_tasks.discard)
+
+
+async def warm_up():
+    """Start and warm the parse workers, parse the embedded sample sheet and preload answer keys.
+
+    /ready reports ready once this finishes. Answer keys that fail to load
+    do not hold readiness back; they are fetched again on first use.
+    """
+    started = time.perf_counter()
+    steps = warmup["steps"]
+    warmup["status"] = "running"
+    try:
+        t = time.perf_counter()
+        await asyncio.to_thread(parse_executor.start)
+        steps["parse_executor"] = {"workers": parse_executor.workers, "seconds": round(time.perf_counter() - t, 3)}
+
+        t = time.perf_counter()
+        records = await parse_executor.parse_document(SAMPLE_PDF)
+        found = (len(records["mcq"]), len(records["sa"]))
+        if found != (SAMPLE_MCQ, SAMPLE_SA):
+            raise RuntimeError(f"Sample sheet parsed to {found[0]} MCQ and {found[1]} SA questions")
+        steps["sample_parse"] = {"seconds": round(time.perf_counter() - t, 3)}
+
+        t = time.perf_counter()
+        preloaded = await answer_key_registry.preload(WARMUP_ANSWER_KEYS)
+        steps["answer_keys"] = {**preloaded, "seconds": round(time.perf_counter() - t, 3)}
+        warmup["status"] = "ready"
+    except Exception as e:
+        warmup["status"] = "failed"
+        warmup["error"] = str(e)
+        logger.error(f"Warm-up failed: {e}")
+    finally:
+        warmup["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Warm-up {warmup['status']} after {warmup['seconds']}s")
+
+
+@app.on_event("startup")
+async def start_job_queue():
+    job_queue.start()
+
+
+@app.on_event("startup")
+async def load_rank_index():
+    if response_store is None:
+        return
+    for date, (digests, totals, sheets) in (await asyncio.to_thread(response_store.scores)).items():
+        rank_index.replace(date, digests, totals, sheets)
+    logger.info(f"Loaded score distributions for {len(rank_index.stats())} exam dates")
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
 
-async def process_file_in_memory(file: UploadFile) -> BytesIO:
-    """Process uploaded file in memory without saving to disk"""
+
+@app.on_event("shutdown")
+async def stop_parse_executor():
+    for task in warmup_tasks:
+        task.cancel()
+    await asyncio.to_thread(parse_executor.shutdown)
+
+
+def check_document(file: UploadFile, html: str):
+    """Reject a request that carries neither a response sheet upload nor pasted HTML, or an unsupported file."""
+    if file is None and not html:
+        raise HTTPException(status_code=400, detail="Upload a PDF or HTML response sheet, or paste its HTML")
+    if file is not None and not is_document_name(file.filename):
+        raise HTTPException(status_code=400, detail="File must be a PDF or HTML response sheet")
+
+
+async def read_document(file: UploadFile, html: str) -> Upload:
+    """The uploaded response sheet, or the sheet's HTML pasted into the `html` form field."""
+    if file is not None:
+        return await read_upload(file)
+    try:
+        with span("upload_read"):
+            return ingest_text(html, PARSE_LIMITS)
+    except DocumentRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+async def read_upload(file: UploadFile) -> Upload:
+    """Ingest an uploaded file (hashed while it is read; spooled to a temp file when large)."""
     try:
-        contents = await file.read()
-        return BytesIO(contents)
+        with span("upload_read"):
+            return await ingest_upload(file, PARSE_LIMITS)
+    except DocumentRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error reading file: {e}")
         raise HTTPException(status_code=500, detail=f"Error reading file: {str(e)}")
 
 
+def key_question_ids(answer_key: list) -> frozenset:
+    """The question IDs of an answer key, for parsing to stop once all of them are found."""
+    return frozenset(str(item["id"]) for item in answer_key if "id" in item)
+
+
+def _stopped_short(records: dict, question_ids) -> bool:
+    # A parse that stopped at the end of another answer key's questions may lack some of these
+    pages = records.get("pages") or {}
+    if pages.get("stopped") != "answer_key" or not question_ids:
+        return False
+    found = {q.question_id for q in records["mcq"]}
+    found.update(q for q, _ in records["sa"])
+    return not found.issuperset(question_ids)
+
+
+def _parse_task(upload: Upload, expected_questions: int = None, question_ids=None) -> asyncio.Task:
+    # The flight may outlive the request that started it (other requests join
+    # it, or this one is cancelled), so it keeps the upload's temp file itself
+    task = asyncio.ensure_future(_parse_and_cache(upload, upload.digest, expected_questions, question_ids))
+    upload.hold_until(task)
+    return task
+
+
+async def parse_upload(upload: Upload, expected_questions: int = None, question_ids=None) -> dict:
+    """Return the parsed MCQ and SA records for an upload, reusing cached parses.
+
+    `expected_questions` (normally the answer key size) lets the fast text
+    backend detect a short read and fall back to accurate extraction.
+    Reading stops once every ID in `question_ids` (see key_question_ids) has
+    been found; records cut short for a different key are parsed again in
+    full. Records served from the result cache are marked "cached".
+    """
+    digest = upload.digest
+    cached = await result_cache.get(digest)
+    if cached is not None:
+        records = typed_records(cached)
+        records["cached"] = True
+        logger.info(f"Parsed result cache hit for {digest[:12]}")
+    else:
+        # Identical uploads arriving together share one parse, if it stops at the same questions
+        records = await parse_flights.do(
+            (digest, question_ids or None), lambda: _parse_task(upload, expected_questions, question_ids))
+    if _stopped_short(records, question_ids):
+        logger.info(f"Parsing {digest[:12]} again: the earlier parse stopped before this key's questions")
+        records = await parse_flights.do((digest, None), lambda: _parse_task(upload, expected_questions))
+    return records
+
+
+async def score_submission(digest: str, date: str, answer_index, records: dict):
+    """Score parsed records and remember the submission; returns (mcq_scores, sa_scores, combined summary)."""
+    mcq_scores, sa_scores = score_records(answer_index, records)
+    summary = combined_summary(mcq_scores, sa_scores)
+    await remember_submission(digest, date, records, summary)
+    return mcq_scores, sa_scores, summary
+
+
+# The score summary fields the response store keeps
+STORED_SCORE_FIELDS = ("correct_questions", "incorrect_questions", "skipped_questions", "dropped_questions",
+                       "total_score")
+
+
+def _store_submission(digest: str, date: str, records: dict, summary: dict):
+    # Runs in a thread: the response store is a blocking SQLite database
+    if records.get("cached"):
+        stored = response_store.get_score(date, digest)
+        if stored is not None and all(stored.get(field, 0) == summary.get(field, 0) for field in STORED_SCORE_FIELDS):
+            return
+    response_store.put(digest, date, records, summary)
+
+
+async def remember_submission(digest: str, date: str, records: dict, summary: dict):
+    """Count the submission's `summary` score for /rank and keep it in the response store.
+
+    /rank counts each sheet (response_store.sheet_key) once, however many
+    copies of it are graded. A cached parse already stored with the same
+    score is not written again.
+    """
+    try:
+        try:
+            sheet = sheet_key(records)
+        except ValueError:
+            sheet = None
+        rank_index.record(date, digest, summary["total_score"], sheet)
+        if response_store is not None:
+            await asyncio.to_thread(_store_submission, digest, date, records, summary)
+    except Exception as e:
+        # Grading the upload matters more than keeping it
+        logger.warning(f"Could not store submission {digest[:12]}: {e}")
+
+
+async def _parse_and_cache(upload: Upload, digest: str, expected_questions: int = None,
+                           question_ids=None) -> dict:
+    records = await parse_executor.parse_document(upload, expected_questions, question_ids)
+    for stage, seconds in records.pop("timings", {}).items():
+        observe_stage(stage, seconds)
+    await result_cache.put(digest, plain_records(records))
+    return records
+
+
+def score_records(answer_index, records: dict):
+    """Score parsed MCQ and SA records; returns (mcq_scores, sa_scores)."""
+    mcq_data, sa_data = records["mcq"], records["sa"]
+    with span("scoring"):
+        mcq_scores = score_mcq(answer_index, [q.question_id for q in mcq_data],
+                               [q.chosen_option_id for q in mcq_data])
+        sa_scores = score_sa(answer_index, [q for q, _ in sa_data], [a for _, a in sa_data])
+    return mcq_scores, sa_scores
+
+
 @app.post("/extract/mcq", response_class=JSONResponse)
-async def extract_mcq(file: UploadFile = File(...), date: str = Form(...)):
+async def extract_mcq(file: UploadFile = File(None), date: str = Form(...), html: str = Form(None)):
+    """Grade the MCQ answers of a PDF or HTML response sheet (uploaded, or HTML pasted as `html`)."""
     try:
+        filename = file.filename if file is not None else None
         logger.info(f"Received date in MCQ endpoint: {date}")
-        logger.info(f"Received file: {file.filename}")
+        logger.info(f"Received file: {filename or 'pasted HTML'}")
         logger.info(f"Current directory: {os.getcwd()}")
 
-        if not file.filename.endswith(".pdf"):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        check_document(file, html)
 
         # Validate date format (DD_MM_YY)
         if not date or not date.replace('_', '').isdigit() or len(date.split('_')) != 3:
             raise HTTPException(status_code=400, detail="Invalid date format. Expected DD_MM_YY (e.g., 04_04_24)")
             
-        file_id = ANSWER_KEY_DRIVE_MAP.get(date)
-        if not file_id:
-            raise ValueError(f"No answer key mapped for date: {date}")
-        answer_key = get_answer_key_from_drive(file_id)
+        answer_key = await answer_key_registry.get(date)
 
-        # Process file in memory
-        pdf_bytes = await process_file_in_memory(file)
+        upload = await read_document(file, html)
 
-        # Extract MCQ data using BytesIO
-        mcq_data = await asyncio.to_thread(extract_mcq_from_pdf, pdf_bytes)
+        # Parse the upload, or reuse the cached records for identical bytes
+        records = await parse_upload(upload, len(answer_key), key_question_ids(answer_key))
+        mcq_data = records["mcq"]
 
         # Check answer key structure
         if not all("id" in item and "correct_option" in item for item in answer_key):
             raise HTTPException(status_code=500, detail="Invalid answer key structure")
 
-        # Create answer key dictionary with proper keys
-        answer_key_dict = {item["id"]: item["correct_option"] for item in answer_key}
-
-        correct_count = incorrect_count = skipped_count = total_score = 0
-
-        # Process MCQ answers
-        for _, row in mcq_data.iterrows():
-            question_id = str(row.get("question_id"))  # Convert to string for comparison
-            chosen_option_id = str(row.get("chosen_option_id")) if row.get("chosen_option_id") else ""
-
-            if question_id not in answer_key_dict:
-                logger.info(f"Question ID {question_id} not found in answer key")
-                continue
-
-            if not chosen_option_id:
-                skipped_count += 1
-            elif chosen_option_id == str(answer_key_dict[question_id]):
-                correct_count += 1
-                total_score += 4
-            else:
-                incorrect_count += 1
-                total_score -= 1
+        answer_index = await answer_key_registry.get_index(date)
+        scores, _, _ = await score_submission(upload.digest, date, answer_index, records)
 
         result = {
-            "mcq_data": mcq_data.to_dict(orient="records"),
-            "filename": file.filename,
-            "score_summary": {
-                "correct_questions": correct_count,
-                "incorrect_questions": incorrect_count,
-                "skipped_questions": skipped_count,
-                "total_questions": correct_count + incorrect_count + skipped_count,
-                "total_score": total_score,
-                "scoring_system": "+4 for correct, -1 for incorrect, 0 for skipped"
-            }
+            "mcq_data": [q.to_dict() for q in mcq_data],
+            "filename": filename,
+            "score_summary": scores.summary(),
+            "pages": records.get("pages")
         }
         return result
 
+    except HTTPException:
+        raise
+    except ParseQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Server busy: {str(e)}")
+    except DocumentRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing MCQ: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
 
 @app.post("/extract/sa", response_class=JSONResponse)
-async def extract_sa(file: UploadFile = File(...), date: str = Form(...)):
+async def extract_sa(file: UploadFile = File(None), date: str = Form(...), html: str = Form(None)):
+    """Grade the short answers of a PDF or HTML response sheet (uploaded, or HTML pasted as `html`)."""
     try:
-        logger.info(f"Processing SA request - File: {file.filename}, Date: {date}")
-        logger.info(f"Received file: {file.filename}")
+        filename = file.filename if file is not None else None
+        logger.info(f"Processing SA request - File: {filename or 'pasted HTML'}, Date: {date}")
         logger.info(f"Current directory: {os.getcwd()}")
 
-        if not file.filename.endswith(".pdf"):
-            raise HTTPException(status_code=400, detail="File must be a PDF")
+        check_document(file, html)
 
         # Validate date format
         if not date or not date.replace('_', '').isdigit() or len(date.split('_')) != 3:
             raise HTTPException(status_code=400, detail="Invalid date format. Expected DD_MM_YY")
 
-        # Process file in memory
         try:
-            pdf_bytes = await process_file_in_memory(file)
-            logger.info("File loaded into memory successfully")
+            upload = await read_document(file, html)
+            logger.info(f"Read upload of {upload.size} bytes")
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Error loading file into memory: {str(e)}")
+            logger.error(f"Error reading upload: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error loading file: {str(e)}")
 
         # Load answer key
         try:
-            file_id = ANSWER_KEY_DRIVE_MAP.get(date)
-            if not file_id:
-                raise ValueError(f"No answer key mapped for date: {date}")
-            answer_key = get_answer_key_from_drive(file_id)
+            answer_key = await answer_key_registry.get(date)
             logger.info(f"Loaded answer key with {len(answer_key)} entries")
         except json.JSONDecodeError as e:
             logger.error(f"Error parsing answer key: {str(e)}")
@@ -162,64 +394,25 @@ async def extract_sa(file: UploadFile = File(...), date: str = Form(...)):
 
         # Extract SA data
         try:
-            sa_data = await asyncio.to_thread(extract_sa_from_pdf, pdf_bytes)
-            # logger.info(f"Extracted SA data with shape: {sa_data.shape}")
+            records = await parse_upload(upload, len(answer_key), key_question_ids(answer_key))
+        except ParseQueueFull as e:
+            raise HTTPException(status_code=503, detail=f"Server busy: {str(e)}")
+        except DocumentRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
         except Exception as e:
             # logger.error(f"Error extracting SA data: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error extracting data from PDF: {str(e)}")
 
         # Process SA answers
         try:
-            answer_key_dict = {str(item["id"]): str(item["correct_option"]) for item in answer_key}
-            results = []
-            total_score = correct_count = incorrect_count = skipped_count = 0
-
-            for _, row in sa_data.iterrows():
-                question_id = str(row.get("question_id"))
-                given_answer = str(row.get("answer", "")).strip()
-
-                # logger.info(f"Processing question {question_id} with answer: {given_answer}")
-
-                if question_id not in answer_key_dict:
-                    # logger.info(f"Question ID {question_id} not found in answer key")
-                    continue
-
-                correct_answer = answer_key_dict[question_id]
-
-                if not given_answer or given_answer.upper() == "NULL":
-                    skipped_count += 1
-                    status = "Not Answered"
-                    points = 0
-                elif given_answer.lower() == correct_answer.lower():  # Case-insensitive comparison
-                    correct_count += 1
-                    total_score += 4
-                    status = "Correct"
-                    points = 4
-                else:
-                    incorrect_count += 1
-                    total_score -= 1
-                    status = "Incorrect"
-                    points = -1
-
-                results.append({
-                    "question_id": question_id,
-                    "given_answer": given_answer,
-                    "correct_answer": correct_answer,
-                    "status": status,
-                    "points": points
-                })
+            answer_index = await answer_key_registry.get_index(date)
+            _, scores, _ = await score_submission(upload.digest, date, answer_index, records)
 
             result = {
-                "sa_data": results,
-                "filename": file.filename,
-                "score_summary": {
-                    "correct_questions": correct_count,
-                    "incorrect_questions": incorrect_count,
-                    "skipped_questions": skipped_count,
-                    "total_questions": correct_count + incorrect_count + skipped_count,
-                    "total_score": total_score,
-                    "scoring_system": "+4 for correct, -1 for incorrect, 0 for skipped"
-                }
+                "sa_data": scores.records(),
+                "filename": filename,
+                "score_summary": scores.summary(),
+                "pages": records.get("pages")
             }
             return result
 
@@ -234,9 +427,410 @@ async def extract_sa(file: UploadFile = File(...), date: str = Form(...)):
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 
+@app.post("/extract/all", response_class=JSONResponse)
+async def extract_all(file: UploadFile = File(None), date: str = Form(...), html: str = Form(None)):
+    """Grade MCQ and SA answers from a single upload (PDF or HTML, or pasted HTML), reading it once."""
+    try:
+        filename = file.filename if file is not None else None
+        logger.info(f"Processing combined request - File: {filename or 'pasted HTML'}, Date: {date}")
+
+        check_document(file, html)
+
+        # Validate date format
+        if not date or not date.replace('_', '').isdigit() or len(date.split('_')) != 3:
+            raise HTTPException(status_code=400, detail="Invalid date format. Expected DD_MM_YY")
+
+        try:
+            answer_key = await answer_key_registry.get(date)
+        except json.JSONDecodeError as e:
+            logger.error(f"Error parsing answer key: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Invalid answer key format: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error loading answer key: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error loading answer key: {str(e)}")
+
+        if not all("id" in item and "correct_option" in item for item in answer_key):
+            raise HTTPException(status_code=500, detail="Invalid answer key structure")
+
+        upload = await read_document(file, html)
+
+        try:
+            records = await parse_upload(upload, len(answer_key), key_question_ids(answer_key))
+        except ParseQueueFull as e:
+            raise HTTPException(status_code=503, detail=f"Server busy: {str(e)}")
+        except DocumentRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error extracting data from PDF: {str(e)}")
+
+        answer_index = await answer_key_registry.get_index(date)
+        mcq_scores, sa_scores, summary = await score_submission(upload.digest, date, answer_index, records)
+
+        return {
+            "mcq_data": [q.to_dict() for q in records["mcq"]],
+            "sa_data": sa_scores.records(),
+            "filename": filename,
+            "mcq_score_summary": mcq_scores.summary(),
+            "sa_score_summary": sa_scores.summary(),
+            "score_summary": summary,
+            "pages": records.get("pages")
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in combined endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+
+def _batch_documents(files: List[UploadFile]) -> list:
+    """List (filename, loader) pairs for every response sheet (PDF or HTML) in the upload, expanding zip archives.
+
+    Loaders are coroutines returning an ingest.Upload, so documents are only
+    read when their parse is about to start.
+    """
+    documents = []
+    for file in files:
+        name = file.filename or ""
+        if name.lower().endswith(".zip"):
+            try:
+                archive = zipfile.ZipFile(file.file)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"{name} is not a valid zip archive")
+            for info in archive.infolist():
+                if not info.is_dir() and is_document_name(info.filename):
+                    documents.append((f"{name}/{info.filename}", _zip_member_loader(archive, info)))
+        elif is_document_name(name):
+            documents.append((name, _upload_loader(file)))
+        else:
+            raise HTTPException(status_code=400,
+                                detail=f"{name}: files must be PDF or HTML response sheets, or zip archives of them")
+        if len(documents) > BATCH_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"A batch may hold at most {BATCH_MAX_FILES} PDFs")
+    return documents
+
+
+def _upload_loader(file: UploadFile):
+    async def load() -> Upload:
+        return await read_upload(file)
+    return load
+
+
+def _zip_member_loader(archive: zipfile.ZipFile, info: zipfile.ZipInfo):
+    def read() -> Upload:
+        # file_size comes from the archive and can lie, so the read itself is bounded too
+        PARSE_LIMITS.check_size(info.file_size)
+        with archive.open(info) as member:
+            return ingest_stream(member, PARSE_LIMITS)
+
+    async def load() -> Upload:
+        try:
+            return await asyncio.to_thread(read)
+        except DocumentRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+    return load
+
+
+async def _grade_document(name: str, load, date: str, answer_index, expected_questions: int, question_ids,
+                          slots: asyncio.Semaphore) -> dict:
+    """Grade one batch member; failures are reported in the result, not raised."""
+    async with slots:
+        try:
+            with await load() as upload:
+                records = await parse_upload(upload, expected_questions, question_ids)
+            mcq_scores, sa_scores, summary = await score_submission(upload.digest, date, answer_index, records)
+            return {
+                "filename": name,
+                "status": "ok",
+                "mcq_score_summary": mcq_scores.summary(),
+                "sa_score_summary": sa_scores.summary(),
+                "score_summary": summary,
+            }
+        except HTTPException as e:
+            return {"filename": name, "status": "error", "status_code": e.status_code, "detail": e.detail}
+        except ParseQueueFull as e:
+            return {"filename": name, "status": "error", "status_code": 503, "detail": f"Server busy: {str(e)}"}
+        except DocumentRejected as e:
+            return {"filename": name, "status": "error", "status_code": e.status_code, "detail": str(e)}
+        except Exception as e:
+            logger.error(f"Error grading {name}: {str(e)}")
+            return {"filename": name, "status": "error", "status_code": 500,
+                    "detail": f"Error processing PDF: {str(e)}"}
+
+
+def batch_summary(results: list) -> dict:
+    """Aggregate the per-student lines of a batch."""
+    scores = [r["score_summary"]["total_score"] for r in results if r["status"] == "ok"]
+    summary = {"files": len(results), "graded": len(scores), "failed": len(results) - len(scores)}
+    if scores:
+        summary.update({
+            "mean_score": round(statistics.fmean(scores), 2),
+            "median_score": statistics.median(scores),
+            "max_score": max(scores),
+            "min_score": min(scores),
+        })
+    return summary
+
+
+@app.post("/grade/batch")
+async def grade_batch(files: List[UploadFile] = File(...), date: str = Form(...)):
+    """Grade many response sheets (PDFs and/or zips of PDFs) against one answer key.
+
+    Streams one NDJSON line per sheet in completion order, followed by a
+    final {"summary": ...} line aggregating the whole batch.
+    """
+    logger.info(f"Processing batch request - {len(files)} uploads, Date: {date}")
+
+    # Validate date format
+    if not date or not date.replace('_', '').isdigit() or len(date.split('_')) != 3:
+        raise HTTPException(status_code=400, detail="Invalid date format. Expected DD_MM_YY")
+
+    try:
+        answer_key = await answer_key_registry.get(date)
+    except Exception as e:
+        logger.error(f"Error loading answer key: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error loading answer key: {str(e)}")
+
+    if not all("id" in item and "correct_option" in item for item in answer_key):
+        raise HTTPException(status_code=500, detail="Invalid answer key structure")
+
+    answer_index = await answer_key_registry.get_index(date)
+    question_ids = key_question_ids(answer_key)
+    documents = _batch_documents(files)
+
+    async def results():
+        # Cap the batch's share of the parse queue so single-sheet requests still get through
+        slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+        tasks = [asyncio.ensure_future(_grade_document(name, load, date, answer_index, len(answer_key),
+                                                       question_ids, slots))
+                 for name, load in documents]
+        graded = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                graded.append(result)
+                yield json.dumps(result) + "\n"
+            yield json.dumps({"summary": batch_summary(graded)}) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+JOB_KINDS = ("mcq", "sa", "all")
+
+
+async def grade_document(upload: Upload, filename: str, date: str, kind: str = "all") -> dict:
+    """Grade one upload the way /extract/<kind> does and return that endpoint's response body."""
+    answer_key = await answer_key_registry.get(date)
+    if not all("id" in item and "correct_option" in item for item in answer_key):
+        raise HTTPException(status_code=500, detail="Invalid answer key structure")
+
+    records = await parse_upload(upload, len(answer_key), key_question_ids(answer_key))
+    answer_index = await answer_key_registry.get_index(date)
+    mcq_scores, sa_scores, summary = await score_submission(upload.digest, date, answer_index, records)
+    if kind == "mcq":
+        return {"mcq_data": [q.to_dict() for q in records["mcq"]], "filename": filename,
+                "score_summary": mcq_scores.summary(), "pages": records.get("pages")}
+    if kind == "sa":
+        return {"sa_data": sa_scores.records(), "filename": filename, "score_summary": sa_scores.summary(),
+                "pages": records.get("pages")}
+    return {
+        "mcq_data": [q.to_dict() for q in records["mcq"]],
+        "sa_data": sa_scores.records(),
+        "filename": filename,
+        "mcq_score_summary": mcq_scores.summary(),
+        "sa_score_summary": sa_scores.summary(),
+        "score_summary": summary,
+        "pages": records.get("pages")
+    }
+
+
+def _queue_full_response(e: JobQueueFull) -> JSONResponse:
+    return JSONResponse(status_code=429, content={"detail": f"Job queue full: {str(e)}"},
+                        headers={"Retry-After": str(e.retry_after)})
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...), date: str = Form(...), kind: str = Form("all")):
+    """Queue a grading job and return its id; poll GET /jobs/{id} or stream /jobs/{id}/events."""
+    if not is_document_name(file.filename):
+        raise HTTPException(status_code=400, detail="File must be a PDF or HTML response sheet")
+
+    # Validate date format
+    if not date or not date.replace('_', '').isdigit() or len(date.split('_')) != 3:
+        raise HTTPException(status_code=400, detail="Invalid date format. Expected DD_MM_YY")
+
+    if kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(JOB_KINDS)}")
+
+    # Reject before reading the upload when there is no room anyway
+    try:
+        job_queue.check_admission()
+    except JobQueueFull as e:
+        return _queue_full_response(e)
+
+    # The job keeps the upload (and any temp file) alive until it has run
+    upload = await read_upload(file)
+    try:
+        job = job_queue.submit(kind, file.filename,
+                               lambda: grade_document(upload, file.filename, date, kind))
+    except JobQueueFull as e:
+        return _queue_full_response(e)
+
+    logger.info(f"Queued {kind} job {job.id} for {file.filename}")
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "poll": f"/jobs/{job.id}",
+        "events": f"/jobs/{job.id}/events",
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """Server-sent events: a "status" event now and a "done" event when the job finishes."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+
+    async def events():
+        yield f"event: status\ndata: {json.dumps({'job_id': job.id, 'status': job.status})}\n\n"
+        while not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+        yield f"event: done\ndata: {json.dumps(job.to_dict())}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/job-queue/stats")
+async def job_queue_stats():
+    return job_queue.stats()
+
+
+@app.post("/answer-keys/{date}/rescore")
+async def rescore_date(date: str):
+    """Reload the answer key for `date` and regrade every stored submission against it."""
+    if response_store is None:
+        raise HTTPException(status_code=503, detail="Response store is not configured (RESPONSE_STORE_PATH)")
+
+    answer_key_registry.invalidate(date)
+    try:
+        answer_index = await answer_key_registry.get_index(date)
+    except Exception as e:
+        logger.error(f"Error loading answer key: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error loading answer key: {str(e)}")
+
+    result = await asyncio.to_thread(response_store.rescore, date, answer_index)
+    digests, totals, sheets = (await asyncio.to_thread(response_store.scores, date)).get(date, ([], [], []))
+    rank_index.replace(date, digests, totals, sheets)
+    return result
+
+
+@app.get("/submissions/{date}/{submission_id}")
+async def get_submission_score(date: str, submission_id: str):
+    """Latest stored score of a submission; its id is the SHA-256 hex digest of the PDF."""
+    if response_store is None:
+        raise HTTPException(status_code=503, detail="Response store is not configured (RESPONSE_STORE_PATH)")
+    summary = await asyncio.to_thread(response_store.get_score, date, submission_id.lower())
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No stored submission with that id for this date")
+    return {"submission_id": submission_id.lower(), "date": date, "score_summary": summary}
+
+
+@app.get("/rank")
+async def get_rank(date: str, score: int = None, submission_id: str = None):
+    """Rank and percentile of a score (or of a graded submission's score) among all graded sheets for `date`."""
+    if score is None:
+        if submission_id is None:
+            raise HTTPException(status_code=400, detail="Pass either score or submission_id")
+        score = rank_index.score_of(date, submission_id.lower())
+        if score is None:
+            raise HTTPException(status_code=404, detail="No graded submission with that id for this date")
+
+    result = rank_index.rank(date, score)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No graded submissions for {date}")
+    return {"date": date, **result}
+
+
+@app.get("/rank/stats")
+async def rank_stats():
+    return rank_index.stats()
+
+
+@app.get("/ready")
+async def ready():
+    """200 once the startup warm-up has finished, 503 (with its progress) until then.
+
+    Also 503 while the parse worker pool is broken; the probe then tries to
+    start a fresh one.
+    """
+    if parse_executor.broken:
+        try:
+            await asyncio.to_thread(parse_executor.start)
+        except Exception as e:
+            logger.error(f"Could not restart the parse workers: {e}")
+    body = {"ready": warmup["status"] == "ready" and not parse_executor.broken, **warmup,
+            "parse_executor_broken": parse_executor.broken}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+# Scraped from the existing stats on every /metrics request
+REGISTRY.register(Gauge("checkmarks_parse_pending", "Parses submitted to the executor and not yet finished.",
+                        lambda: parse_executor.stats()["pending"]))
+REGISTRY.register(Gauge("checkmarks_jobs", "Jobs in the job queue, by state.",
+                        lambda: {(state,): job_queue.stats()[state] for state in ("queued", "running")}, ("state",)))
+REGISTRY.register(Gauge("checkmarks_result_cache_lookups_total", "Parsed result cache lookups, by outcome.",
+                        lambda: {(outcome,): result_cache.stats()[outcome]
+                                 for outcome in ("memory_hits", "disk_hits", "misses")},
+                        ("outcome",), kind="counter"))
+REGISTRY.register(Gauge("checkmarks_answer_key_lookups_total", "Answer key cache lookups, by outcome.",
+                        lambda: {(outcome,): answer_key_registry.stats()[outcome] for outcome in ("hits", "misses")},
+                        ("outcome",), kind="counter"))
+REGISTRY.register(Gauge("checkmarks_ready", "1 once the startup warm-up has finished and the parse workers are up.",
+                        lambda: int(warmup["status"] == "ready" and not parse_executor.broken)))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage and request latency histograms plus queue and cache gauges, in the Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/parse-executor/stats")
+async def parse_executor_stats():
+    return parse_executor.stats()
+
+
+@app.get("/result-cache/stats")
+async def result_cache_stats():
+    return {**result_cache.stats(), "parse_flights": parse_flights.stats()}
+
+
+@app.get("/answer-keys/stats")
+async def answer_key_stats():
+    return answer_key_registry.stats()
+
+
 @app.get("/")
 async def root():
-    return {"message": "Welcome to the PDF Question Extractor API. Use /extract/mcq or /extract/sa endpoints."}
+    return {"message": "Welcome to the PDF Question Extractor API. Use /extract/mcq, /extract/sa, /extract/all or /grade/batch endpoints."}
 
 
 if __name__ == "__main__":
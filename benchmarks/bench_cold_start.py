@@ -0,0 +1,92 @@
+"""Benchmark: import time, startup and first-request latency of app.py.
+
+Run with `python -m benchmarks.bench_cold_start`. Each measurement runs in
+a fresh interpreter (so nothing is already imported or warmed) with a local
+answer key for a synthetic 90-question sheet:
+
+  import     `import app`, and which heavy modules that pulls in
+  serving    from entering the app's lifespan until the startup hooks return
+             and requests are accepted
+  ready      until GET /ready answers 200 (same as serving without /ready)
+  first      the first POST /extract/all after startup
+  steady     the median of the next 10, each with a different sheet so the
+             parsed result cache never hits
+"""
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+import tempfile
+
+HEAVY_MODULES = ("pdfplumber", "pdfminer", "pandas", "requests")
+DATE = "04_04_24"
+QUESTIONS = 90
+
+
+def write_key(directory: str):
+    from benchmarks.synthetic import answer_key
+    with open(os.path.join(directory, f"{DATE}.json"), "w") as f:
+        json.dump(answer_key(QUESTIONS), f)
+
+
+def measure_import():
+    started = time.perf_counter()
+    import app  # noqa: F401
+    seconds = time.perf_counter() - started
+    print(json.dumps({"import_seconds": seconds, "loaded": [m for m in HEAVY_MODULES if m in sys.modules]}))
+
+
+def measure_requests():
+    from fastapi.testclient import TestClient
+    import app
+    from benchmarks.synthetic import sheet_pdf
+    sheets = [sheet_pdf(QUESTIONS, seed=seed) for seed in range(11)]
+    has_ready = any(getattr(route, "path", None) == "/ready" for route in app.app.routes)
+
+    started = time.perf_counter()
+    with TestClient(app.app) as client:
+        serving = time.perf_counter() - started
+        while has_ready and client.get("/ready").status_code != 200:
+            time.sleep(0.01)
+        ready = time.perf_counter() - started
+
+        latencies = []
+        for n, pdf in enumerate(sheets):
+            t = time.perf_counter()
+            response = client.post("/extract/all", files={"file": (f"{n}.pdf", pdf, "application/pdf")},
+                                   data={"date": DATE})
+            latencies.append(time.perf_counter() - t)
+            assert response.status_code == 200, response.text
+    print(json.dumps({"serving_seconds": serving, "ready_seconds": ready, "first_seconds": latencies[0],
+                      "steady_seconds": statistics.median(latencies[1:])}))
+
+
+def run_child(mode: str, env: dict) -> dict:
+    output = subprocess.run([sys.executable, "-m", "benchmarks.bench_cold_start", mode], env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--import":
+        measure_import()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--requests":
+        measure_requests()
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_key(tmp)
+            env = {**os.environ, "ANSWER_KEY_SOURCE": "local", "ANSWER_KEY_DIR": tmp,
+                   "ANSWER_KEY_INDEX_PATH": os.path.join(tmp, ".answer_keys.idx"),
+                   "PARSE_WORKERS": os.environ.get("PARSE_WORKERS", "2")}
+            imports = [run_child("--import", env) for _ in range(3)]
+            best = min(imports, key=lambda r: r["import_seconds"])
+            print(f"import app      {best['import_seconds'] * 1e3:7.0f} ms  "
+                  f"(heavy modules loaded: {', '.join(best['loaded']) or 'none'})")
+            for mode in ("process", "thread"):
+                result = run_child("--requests", {**env, "PARSE_EXECUTOR": mode})
+                print(f"{mode:7s} serving {result['serving_seconds'] * 1e3:5.0f} ms  "
+                      f"ready {result['ready_seconds'] * 1e3:5.0f} ms  "
+                      f"first request {result['first_seconds'] * 1e3:6.0f} ms  "
+                      f"steady {result['steady_seconds'] * 1e3:6.0f} ms")
@@ -0,0 +1,94 @@
+"""Benchmark: typed parse records vs the per-request pandas DataFrames.
+
+Run with `python -m benchmarks.bench_records`. For a synthetic 90-question
+sheet (60 MCQ, 30 SA) it compares what one request does after the text is
+scanned:
+
+  dataframe  build the MCQ and SA DataFrames the way extract_mcq_from_pdf /
+             extract_sa_from_pdf did, then go back to Python with iterrows()
+             and to_dict(orient="records") to score and serialize
+  records    score straight from the MCQRecords / SARecords and call
+             to_dict() once for the response body
+
+and reports the mean latency and the bytes allocated (tracemalloc) per
+request, plus the time `import models` takes now that it no longer pulls in
+pandas.
+"""
+import subprocess
+import sys
+import timeit
+import tracemalloc
+import pandas as pd
+from models import scan_questions
+from scoring import AnswerKeyIndex, score_mcq, score_sa
+from benchmarks.synthetic import sheet_text
+
+QUESTIONS = 90
+
+
+def answer_key(mcq, sa) -> AnswerKeyIndex:
+    key = [{"id": q.question_id, "correct_option": q.option_ids[0]} for q in mcq]
+    key += [{"id": question_id, "correct_option": "7"} for question_id, _ in sa]
+    return AnswerKeyIndex(key)
+
+
+def via_dataframes(index, mcq, sa) -> dict:
+    mcq_df = pd.DataFrame([q.to_dict() for q in mcq])
+    sa_df = pd.DataFrame(list(sa), columns=["question_id", "answer"])
+    sa_df["question"] = ""
+    question_ids, chosen = [], []
+    for _, row in mcq_df.iterrows():
+        question_ids.append(row["question_id"])
+        chosen.append(row["chosen_option_id"])
+    mcq_scores = score_mcq(index, question_ids, chosen)
+    sa_scores = score_sa(index, sa_df["question_id"].tolist(), sa_df["answer"].tolist())
+    return {"mcq_data": mcq_df.to_dict(orient="records"), "sa_data": sa_scores.records(),
+            "mcq_score_summary": mcq_scores.summary(), "sa_score_summary": sa_scores.summary()}
+
+
+def via_records(index, mcq, sa) -> dict:
+    mcq_scores = score_mcq(index, [q.question_id for q in mcq], [q.chosen_option_id for q in mcq])
+    sa_scores = score_sa(index, [q for q, _ in sa], [a for _, a in sa])
+    return {"mcq_data": [q.to_dict() for q in mcq], "sa_data": sa_scores.records(),
+            "mcq_score_summary": mcq_scores.summary(), "sa_score_summary": sa_scores.summary()}
+
+
+def allocated(fn, repeat: int = 50) -> float:
+    """Mean bytes allocated per call (tracemalloc peak, after one warm-up call)."""
+    fn()
+    tracemalloc.start()
+    total = 0
+    for _ in range(repeat):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        fn()
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / repeat
+
+
+def import_seconds(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    return min(float(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                     check=True).stdout) for _ in range(3))
+
+
+if __name__ == "__main__":
+    mcq, sa = scan_questions(sheet_text(QUESTIONS))
+    index = answer_key(mcq, sa)
+    assert via_dataframes(index, mcq, sa) == via_records(index, mcq, sa)
+    print(f"{QUESTIONS}-question sheet ({len(mcq)} MCQ, {len(sa)} SA): both paths give the same response body")
+
+    rows = []
+    for name, fn in (("dataframe", via_dataframes), ("records", via_records)):
+        run = lambda: fn(index, mcq, sa)  # noqa: E731
+        seconds = min(timeit.repeat(run, number=200, repeat=5)) / 200
+        rows.append((name, seconds, allocated(run)))
+    for name, seconds, peak in rows:
+        print(f"  {name:10s} {seconds * 1e3:7.3f} ms  {peak / 1024:8.1f} KiB allocated per request")
+    print(f"  speedup {rows[0][1] / rows[1][1]:.1f}x, {rows[0][2] / rows[1][2]:.1f}x less allocation")
+
+    loaded = subprocess.run([sys.executable, "-c", "import models, sys; print('pandas' in sys.modules)"],
+                            capture_output=True, text=True, check=True).stdout.strip()
+    print(f"import models: {import_seconds('models') * 1e3:.0f} ms (pandas loaded: {loaded}); "
+          f"import pandas alone: {import_seconds('pandas') * 1e3:.0f} ms")
@@ -0,0 +1,90 @@
+"""Benchmark: bulk rescoring of stored submissions after an answer key revision.
+
+Run with `python -m benchmarks.bench_rescore [submissions]` (default 100000).
+Fills a temporary ResponseStore with synthetic 90-question submissions
+(60 MCQ, 30 SA), revises the key (one answer becomes DROP, one changes),
+rescores the date and checks a sample of the stored scores against the
+per-request scorers.
+"""
+import os
+import sys
+import random
+import tempfile
+import time
+from models import MCQRecord, SARecord
+from response_store import ResponseStore
+from scoring import AnswerKeyIndex, score_mcq, score_sa, combined_summary
+
+DATE = "04_04_24"
+MCQ_QUESTIONS = 60
+SA_QUESTIONS = 30
+
+
+def synthetic_key(seed: int = 0) -> list:
+    rng = random.Random(seed)
+    key = []
+    for n in range(MCQ_QUESTIONS):
+        key.append({"id": str(68019114064 + n), "correct_option": str(68019155001 + 4 * n + rng.randrange(4))})
+    for n in range(MCQ_QUESTIONS, MCQ_QUESTIONS + SA_QUESTIONS):
+        key.append({"id": str(68019114064 + n), "correct_option": str(rng.randint(0, 99))})
+    return key
+
+
+def synthetic_records(rng: random.Random) -> dict:
+    mcq = []
+    for n in range(MCQ_QUESTIONS):
+        options = [str(68019155001 + 4 * n + k) for k in range(4)]
+        chosen = rng.choice(["1", "2", "3", "4", ""])
+        mcq.append(MCQRecord(str(68019114064 + n), tuple(options), "Answered" if chosen else "Not Answered",
+                             chosen, options[int(chosen) - 1] if chosen else ""))
+    sa = [SARecord(str(68019114064 + n), rng.choice(["NULL", str(rng.randint(0, 99))]))
+          for n in range(MCQ_QUESTIONS, MCQ_QUESTIONS + SA_QUESTIONS)]
+    return {"mcq": mcq, "sa": sa}
+
+
+def expected_summary(index: AnswerKeyIndex, records: dict) -> dict:
+    mcq, sa = records["mcq"], records["sa"]
+    return combined_summary(
+        score_mcq(index, [q.question_id for q in mcq], [q.chosen_option_id for q in mcq]),
+        score_sa(index, [q for q, _ in sa], [a for _, a in sa]),
+    )
+
+
+if __name__ == "__main__":
+    submissions = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(1)
+    key = synthetic_key()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "responses.sqlite3")
+        store = ResponseStore(path)
+        sample = {}
+        started = time.perf_counter()
+        for chunk_start in range(0, submissions, 5000):
+            chunk = []
+            for i in range(chunk_start, min(chunk_start + 5000, submissions)):
+                records = synthetic_records(rng)
+                digest = f"{i:064x}"
+                chunk.append((digest, DATE, records, None))
+                if i % 997 == 0:
+                    sample[digest] = records
+            store.put_many(chunk)
+        print(f"stored {submissions} submissions in {time.perf_counter() - started:.1f}s "
+              f"({os.path.getsize(path) / submissions:.0f} bytes each on disk)")
+
+        # The revision: one MCQ answer dropped, one SA answer corrected
+        key[3]["correct_option"] = "DROP"
+        key[MCQ_QUESTIONS + 5]["correct_option"] = "42"
+        index = AnswerKeyIndex(key)
+        timings = store.rescore(DATE, index)
+
+        for digest, records in sample.items():
+            stored = store.get_score(DATE, digest)
+            stored.pop("scored_at")
+            expected = expected_summary(index, records)
+            expected.pop("scoring_system")
+            assert stored == expected, f"{digest}: {stored} != {expected}"
+        print(f"{len(sample)} sampled submissions match per-request scoring")
+        print(f"rescored {timings['submissions']} submissions in {timings['total_seconds']:.2f}s "
+              f"(load {timings['load_seconds']:.2f}s, score {timings['score_seconds']:.2f}s, "
+              f"write {timings['write_seconds']:.2f}s)")
@@ -0,0 +1,131 @@
+"""Micro-benchmark: iterrows scoring loops vs the vectorized scoring engine.
+
+Run with `python -m benchmarks.bench_scoring`. Every run also checks that
+both implementations produce the same score_summary and per-question output.
+"""
+import random
+import timeit
+import pandas as pd
+from scoring import SCORING_SYSTEM, AnswerKeyIndex, score_mcq, score_sa
+
+
+def make_inputs(rows: int, seed: int = 0):
+    """Synthetic answer key plus MCQ and SA response frames with `rows` rows each."""
+    rng = random.Random(seed)
+    base_qid = 68019114064
+    key = []
+    mcq_rows = []
+    sa_rows = []
+    for i in range(rows):
+        qid = str(base_qid + i)
+        options = [str(68019155000 + 4 * i + k) for k in range(4)]
+        if i % 2 == 0:
+            key.append({"id": qid, "correct_option": rng.choice(options)})
+            chosen = rng.choice(["", "1", "2", "3", "4"])
+            mcq_rows.append({"question_id": qid, "chosen_option_id": options[int(chosen) - 1] if chosen else ""})
+        else:
+            answer = str(rng.randint(0, 20))
+            key.append({"id": qid, "correct_option": answer})
+            sa_rows.append({"question_id": qid, "answer": rng.choice(["NULL", answer, str(rng.randint(0, 20))])})
+    # A few responses that are not in the key at all
+    mcq_rows.append({"question_id": "1", "chosen_option_id": "2"})
+    sa_rows.append({"question_id": "1", "answer": "2"})
+    return key, pd.DataFrame(mcq_rows), pd.DataFrame(sa_rows)
+
+
+def legacy_mcq(mcq_data, answer_key):
+    answer_key_dict = {item["id"]: item["correct_option"] for item in answer_key}
+    correct_count = incorrect_count = skipped_count = total_score = 0
+    for _, row in mcq_data.iterrows():
+        question_id = str(row.get("question_id"))
+        chosen_option_id = str(row.get("chosen_option_id")) if row.get("chosen_option_id") else ""
+        if question_id not in answer_key_dict:
+            continue
+        if not chosen_option_id:
+            skipped_count += 1
+        elif chosen_option_id == str(answer_key_dict[question_id]):
+            correct_count += 1
+            total_score += 4
+        else:
+            incorrect_count += 1
+            total_score -= 1
+    return {
+        "correct_questions": correct_count,
+        "incorrect_questions": incorrect_count,
+        "skipped_questions": skipped_count,
+        "total_questions": correct_count + incorrect_count + skipped_count,
+        "total_score": total_score,
+        "scoring_system": SCORING_SYSTEM
+    }
+
+
+def legacy_sa(sa_data, answer_key):
+    answer_key_dict = {str(item["id"]): str(item["correct_option"]) for item in answer_key}
+    results = []
+    total_score = correct_count = incorrect_count = skipped_count = 0
+    for _, row in sa_data.iterrows():
+        question_id = str(row.get("question_id"))
+        given_answer = str(row.get("answer", "")).strip()
+        if question_id not in answer_key_dict:
+            continue
+        correct_answer = answer_key_dict[question_id]
+        if not given_answer or given_answer.upper() == "NULL":
+            skipped_count += 1
+            status = "Not Answered"
+            points = 0
+        elif given_answer.lower() == correct_answer.lower():
+            correct_count += 1
+            total_score += 4
+            status = "Correct"
+            points = 4
+        else:
+            incorrect_count += 1
+            total_score -= 1
+            status = "Incorrect"
+            points = -1
+        results.append({"question_id": question_id, "given_answer": given_answer,
+                        "correct_answer": correct_answer, "status": status, "points": points})
+    return results, {
+        "correct_questions": correct_count,
+        "incorrect_questions": incorrect_count,
+        "skipped_questions": skipped_count,
+        "total_questions": correct_count + incorrect_count + skipped_count,
+        "total_score": total_score,
+        "scoring_system": SCORING_SYSTEM
+    }
+
+
+def vectorized_mcq(mcq_data, index):
+    return score_mcq(index, mcq_data["question_id"].tolist(), mcq_data["chosen_option_id"].tolist()).summary()
+
+
+def vectorized_sa(sa_data, index):
+    scores = score_sa(index, sa_data["question_id"].tolist(), sa_data["answer"].tolist())
+    return scores.records(), scores.summary()
+
+
+def run(rows: int, repeat: int = 5):
+    key, mcq_data, sa_data = make_inputs(rows)
+    index = AnswerKeyIndex(key)
+
+    assert legacy_mcq(mcq_data, key) == vectorized_mcq(mcq_data, index), "MCQ output differs"
+    assert legacy_sa(sa_data, key) == vectorized_sa(sa_data, index), "SA output differs"
+
+    number = max(1, 2000 // rows)
+    timings = {}
+    for name, fn in [("legacy_mcq", lambda: legacy_mcq(mcq_data, key)),
+                     ("vectorized_mcq", lambda: vectorized_mcq(mcq_data, index)),
+                     ("legacy_sa", lambda: legacy_sa(sa_data, key)),
+                     ("vectorized_sa", lambda: vectorized_sa(sa_data, index))]:
+        timings[name] = min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+    return timings
+
+
+if __name__ == "__main__":
+    for rows in (90, 10_000):
+        t = run(rows)
+        print(f"{rows} questions:")
+        for kind in ("mcq", "sa"):
+            legacy, fast = t[f"legacy_{kind}"], t[f"vectorized_{kind}"]
+            print(f"  {kind.upper():3} legacy {legacy * 1e3:8.3f} ms  vectorized {fast * 1e3:8.3f} ms  "
+                  f"speedup {legacy / fast:5.1f}x")
@@ -0,0 +1,168 @@
+"""Benchmark: per-stage timings of parsing and scoring on synthetic response sheets.
+
+Run with `python -m benchmarks.bench_stages [--output results.json]`. Each
+scenario builds a sheet with benchmarks.synthetic and times, as the median
+of `--repeat` runs:
+
+  pdf_text_accurate     models.extract_pdf_text, pdfplumber backend
+  pdf_text_fast         models.extract_pdf_text, pdfminer layout backend
+  mcq_parse             JEEExamParser.parse_exam_text on the extracted text
+  sa_parse              models.parse_sa_lines on the extracted lines
+  extract_mcq_from_pdf  the whole MCQ path, PDF to DataFrame
+  extract_sa_from_pdf   the whole SA path, PDF to DataFrame
+  parse_all_records     the path the API uses (default text backend)
+  parse_html_records    the same for the sheet's HTML page (no PDF rendering)
+  answer_key_index      building the scoring index from the answer key
+  score_mcq / score_sa  scoring the parsed records
+
+`--compare baseline.json` runs the suite (or loads `--current FILE`) and
+exits non-zero if any stage's median is more than `--threshold` (a
+fraction) slower than the baseline's and the difference exceeds
+`--min-delta` seconds, so timer noise on sub-millisecond stages does not
+fail the check. Baselines are only comparable on the same machine.
+"""
+import sys
+import json
+import logging
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+from io import BytesIO
+import models
+from scoring import AnswerKeyIndex, score_mcq, score_sa
+from benchmarks.synthetic import sheet_pdf, sheet_html, answer_key
+
+# name: (questions, pages); "jee_main" is the size of a real paper
+SCENARIOS = {
+    "short": (30, 4),
+    "jee_main": (90, 12),
+    "long": (300, 40),
+}
+
+
+def _median_seconds(fn, repeat: int):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return {"median": statistics.median(times), "min": min(times)}
+
+
+def run_scenario(questions: int, pages: int, repeat: int) -> dict:
+    pdf = sheet_pdf(questions, pages)
+    html = sheet_html(questions)
+    key = answer_key(questions)
+    text = models.extract_pdf_text(BytesIO(pdf))
+    lines = text.split("\n")
+    records = models.parse_all_records(pdf)
+    index = AnswerKeyIndex(key)
+    mcq_ids = [q.question_id for q in records["mcq"]]
+    chosen = [q.chosen_option_id for q in records["mcq"]]
+    sa_ids = [q for q, _ in records["sa"]]
+    answers = [a for _, a in records["sa"]]
+    if len(records["mcq"]) + len(records["sa"]) != questions:
+        raise RuntimeError(f"Synthetic sheet parsed to {len(records['mcq'])} MCQ and {len(records['sa'])} SA "
+                           f"questions, expected {questions}")
+
+    stages = {
+        "pdf_text_accurate": lambda: models.extract_pdf_text(BytesIO(pdf), "accurate"),
+        "pdf_text_fast": lambda: models.extract_pdf_text(BytesIO(pdf), "fast"),
+        "mcq_parse": lambda: models.JEEExamParser(BytesIO(pdf)).parse_exam_text(text),
+        "sa_parse": lambda: models.parse_sa_lines(lines),
+        "extract_mcq_from_pdf": lambda: models.extract_mcq_from_pdf(BytesIO(pdf)),
+        "extract_sa_from_pdf": lambda: models.extract_sa_from_pdf(BytesIO(pdf)),
+        "parse_all_records": lambda: models.parse_all_records(pdf),
+        "parse_html_records": lambda: models.parse_all_records(html),
+        "answer_key_index": lambda: AnswerKeyIndex(key),
+        "score_mcq": lambda: score_mcq(index, mcq_ids, chosen),
+        "score_sa": lambda: score_sa(index, sa_ids, answers),
+    }
+    return {"questions": questions, "pages": pages, "pdf_bytes": len(pdf),
+            "stages": {name: _median_seconds(fn, repeat) for name, fn in stages.items()}}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(scenarios: list, repeat: int) -> dict:
+    results = {"meta": {"commit": _commit(), "python": platform.python_version(), "machine": platform.platform(),
+                        "text_backend": models.TEXT_BACKEND, "repeat": repeat,
+                        "created": time.strftime("%Y-%m-%dT%H:%M:%S")},
+               "scenarios": {}}
+    for name in scenarios:
+        questions, pages = SCENARIOS[name]
+        results["scenarios"][name] = run_scenario(questions, pages, repeat)
+    return results
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_delta: float) -> list:
+    """Print each stage against the baseline; returns the (scenario, stage) pairs that regressed."""
+    regressions = []
+    for scenario, result in current["scenarios"].items():
+        base_stages = baseline["scenarios"].get(scenario, {}).get("stages", {})
+        for stage, timing in result["stages"].items():
+            if stage not in base_stages:
+                continue
+            before, after = base_stages[stage]["median"], timing["median"]
+            regressed = after > before * (1 + threshold) and after - before > min_delta
+            if regressed:
+                regressions.append((scenario, stage))
+            print(f"  {scenario:9s} {stage:21s} {before * 1e3:9.3f} -> {after * 1e3:9.3f} ms  "
+                  f"{after / before if before else float('inf'):5.2f}x{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def print_results(results: dict):
+    for scenario, result in results["scenarios"].items():
+        print(f"{scenario}: {result['questions']} questions, {result['pages']} pages, "
+              f"{result['pdf_bytes'] / 1024:.0f} KiB")
+        for stage, timing in result["stages"].items():
+            print(f"  {stage:21s} {timing['median'] * 1e3:9.3f} ms  (min {timing['min'] * 1e3:.3f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time each parsing and scoring stage on synthetic sheets.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="run only this scenario (repeatable); default all")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="fail on regressions against this results JSON")
+    parser.add_argument("--current", help="compare this results JSON instead of running the suite")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown as a fraction of the baseline (default 0.25)")
+    parser.add_argument("--min-delta", type=float, default=0.001,
+                        help="ignore slowdowns smaller than this many seconds (default 0.001)")
+    args = parser.parse_args()
+    # models logs every parse at INFO
+    logging.disable(logging.INFO)
+
+    if args.current:
+        with open(args.current) as f:
+            results = json.load(f)
+    else:
+        results = run_suite(args.scenario or list(SCENARIOS), args.repeat)
+        print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Against {args.compare} (commit {baseline['meta'].get('commit')}), "
+              f"threshold +{args.threshold:.0%} and {args.min_delta * 1e3:g} ms:")
+        regressions = compare(baseline, results, args.threshold, args.min_delta)
+        if regressions:
+            print(f"{len(regressions)} stage(s) regressed: "
+                  + ", ".join(f"{scenario}/{stage}" for scenario, stage in regressions))
+            sys.exit(1)
+        print("No regressions")
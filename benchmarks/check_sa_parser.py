@@ -0,0 +1,97 @@
+"""Equivalence check and timing for the single-pass short-answer parser.
+
+Run with `python -m benchmarks.check_sa_parser`. The corpus below covers the
+edge cases of the original nested-scan parser (Given before any ID, IDs on
+the Given line itself, trailing Givens without a later ID, several Givens
+sharing one ID, ...) plus randomly generated sheets; every case must give
+identical output from `models.parse_sa_lines`, from `models.QuestionScanner`
+(fed the whole text, and one line at a time) and from the original algorithm.
+"""
+import re
+import random
+import timeit
+from models import QuestionScanner, parse_sa_lines
+
+CORPUS = [
+    [],
+    [""],
+    ["Given12", "Question Type : SA", "Question ID :101"],
+    ["Given", "Question ID :101"],
+    ["Given --", "Question ID :101", "Given7", "Question ID :102"],
+    ["Question ID :100", "Given5", "Given6", "Question ID :101"],
+    ["Given5 Question ID :100", "Question ID :101"],
+    ["Given5", "Given7 Question ID :2"],
+    ["Given5", "Given7 Question ID :2", "Given8", "Question ID :3"],
+    ["Given1", "Question ID :100", "Given2"],
+    ["Given1", "Given2"],
+    ["Question ID :100", "Given3"],
+    ["Given4", "Question ID : 100", "Question ID :101"],
+    ["GivenGiven9", "Question ID :100 Question ID :200", "Given10Given11", "x", "Question ID :300"],
+    ["Q.1 Given Answer :", "Question Type : SA", "Question ID :68019114124", "Status : Answered"],
+    ["Given 12", "Question ID :1", "Given12", "Question ID :2", "Given0012", "Question ID :3"],
+]
+
+
+def legacy_parse_sa_lines(text_lines):
+    """The original O(lines x answers) forward scan from models.extract_sa_from_pdf."""
+    given_values = []
+    question_id = None
+    for i, line in enumerate(text_lines):
+        match = re.search(r"Given(\d+)?", line)
+        if match:
+            value = match.group(1) if match.group(1) else "NULL"
+            for j in range(i + 1, len(text_lines)):
+                qid_match = re.search(r"Question ID :(\d+)", text_lines[j])
+                if qid_match:
+                    question_id = qid_match.group(1)
+                    break
+            given_values.append((question_id, value))
+    return given_values
+
+
+def random_sheet(rng: random.Random, questions: int):
+    lines = []
+    for n in range(questions):
+        kind = rng.random()
+        lines.append(f"Q.{n + 1} Some question text")
+        if kind < 0.5:
+            lines += ["Question Type : MCQ", f"Question ID :{680191140 + n}",
+                      "Option 1 ID :1", "Status : Answered", f"Chosen Option :{rng.randint(1, 4)}"]
+        else:
+            lines.append(rng.choice(["Given --", f"Given{rng.randint(0, 999)}", "Given"]))
+            if rng.random() < 0.9:
+                lines += ["Question Type : SA", f"Question ID :{680191140 + n}"]
+            lines.append("Status : Answered")
+    return lines
+
+
+def scanner_sa(pieces):
+    scanner = QuestionScanner()
+    records = []
+    for piece in pieces:
+        records += scanner.feed(piece)[1]
+    return records + scanner.close()[1]
+
+
+def check(cases):
+    for lines in cases:
+        expected = legacy_parse_sa_lines(lines)
+        for name, actual in (("parse_sa_lines", parse_sa_lines(lines)),
+                             ("QuestionScanner", scanner_sa(["\n".join(lines)])),
+                             ("QuestionScanner by line", scanner_sa([line + "\n" for line in lines]))):
+            assert actual == expected, f"{name} mismatch for {lines!r}:\n{actual!r}\n!=\n{expected!r}"
+
+
+if __name__ == "__main__":
+    rng = random.Random(7)
+    generated = [random_sheet(rng, rng.randint(0, 120)) for _ in range(500)]
+    check(CORPUS)
+    check(generated)
+    print(f"{len(CORPUS) + len(generated)} corpus sheets: outputs identical")
+
+    for questions in (90, 1000):
+        lines = random_sheet(random.Random(questions), questions)
+        legacy = min(timeit.repeat(lambda: legacy_parse_sa_lines(lines), number=5, repeat=3)) / 5
+        fast = min(timeit.repeat(lambda: parse_sa_lines(lines), number=5, repeat=3)) / 5
+        print(f"{questions:5} questions: legacy {legacy * 1e3:8.2f} ms  single-pass {fast * 1e3:6.3f} ms  "
+              f"speedup {legacy / fast:6.1f}x")
@@ -0,0 +1,122 @@
+"""Synthetic JEE-style response sheets, so benchmarks need no real (student) PDFs.
+
+Sheets use the layout models.py parses ("Question Type : MCQ", "Question
+ID", "Option n ID", "Status", "Chosen Option", and "Given" for short
+answers); every third question is SA. `sheet_html` is the same sheet as
+the HTML page it is printed from. `answer_key` builds the matching key.
+Run `python -m benchmarks.synthetic OUT.pdf [--questions 90] [--pages N]
+[--seed 0] [--key KEY.json]` to write a sheet (and its key) to disk, e.g.
+the test.pdf that locustfile.py uploads.
+"""
+import json
+import random
+import argparse
+from sample_sheet import build_pdf
+
+BASE_QUESTION_ID = 68019114064
+BASE_OPTION_ID = 68019155000
+# Lines that fit on one page at build_pdf's 11pt leading
+MAX_LINES_PER_PAGE = 70
+
+
+def _is_mcq(n: int) -> bool:
+    return n % 3 != 2
+
+
+def _responses(questions: int, seed: int):
+    """(n, question ID, response) per question: the chosen option for an MCQ, the given answer for SA."""
+    rng = random.Random(seed)
+    for n in range(questions):
+        if _is_mcq(n):
+            yield n, BASE_QUESTION_ID + n, rng.choice(["1", "2", "3", "4", "--"])
+        else:
+            yield n, BASE_QUESTION_ID + n, rng.choice(["--", str(rng.randint(0, 999))])
+
+
+def sheet_lines(questions: int = 90, seed: int = 0) -> list:
+    """Text lines shaped like pdfplumber's output for a response sheet."""
+    lines = ["Candidate Response Sheet", "Application No : 000000000000", "Test Date : 04/04/2024"]
+    for n, qid, response in _responses(questions, seed):
+        lines.append(f"Q.{n + 1} Consider the following statement about question {n + 1}.")
+        if _is_mcq(n):
+            lines += ["Question Type : MCQ", f"Question ID : {qid}"]
+            lines += [f"Option {k} ID : {BASE_OPTION_ID + 4 * n + k}" for k in range(1, 5)]
+            lines += [f"Status : {'Not Answered' if response == '--' else 'Answered'}",
+                      f"Chosen Option : {response}"]
+        else:
+            lines += ["Given" + (response if response != "--" else " --"), "Question Type : SA",
+                      f"Question ID :{qid}", "Status : Answered"]
+    return lines
+
+
+def _menu_rows(rows: list) -> str:
+    return "".join(f'<tr><td align="right">{label} :</td><td class="bold">{value}</td></tr>' for label, value in rows)
+
+
+def sheet_html(questions: int = 90, seed: int = 0) -> bytes:
+    """The same sheet as sheet_lines, as the HTML response sheet page (UTF-8)."""
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>Candidate Response Sheet</title>',
+             "<style>.bold { font-weight: bold; }</style><script>var Given = 0;</script></head><body>",
+             '<div class="main-info-pnl"><table><tr><td>Application No</td><td>000000000000</td></tr>',
+             "<tr><td>Test Date</td><td>04/04/2024</td></tr></table></div>"]
+    for n, qid, response in _responses(questions, seed):
+        parts.append('<div class="question-pnl"><table class="questionPnlTbl"><tr><td>'
+                     f'<table class="questionRowTbl"><tr><td class="bold">Q.{n + 1}</td>'
+                     f"<td>Consider the following statement about question {n + 1}.</td></tr>")
+        if _is_mcq(n):
+            rows = [("Question Type", "MCQ"), ("Question ID", qid)]
+            rows += [(f"Option {k} ID", BASE_OPTION_ID + 4 * n + k) for k in range(1, 5)]
+            rows += [("Status", "Not Answered" if response == "--" else "Answered"), ("Chosen Option", response)]
+        else:
+            parts.append(_menu_rows([("Given Answer", response)]))
+            rows = [("Question Type", "SA"), ("Question ID", qid), ("Status", "Answered")]
+        parts.append(f'</table></td><td><table class="menu-tbl">{_menu_rows(rows)}</table></td></tr></table></div>')
+    parts.append("</body></html>")
+    return "\n".join(parts).encode()
+
+
+def sheet_text(questions: int = 90, seed: int = 0) -> str:
+    """The sheet's text as one string, the way extract_pdf_text returns it."""
+    return "\n".join(sheet_lines(questions, seed)) + "\n"
+
+
+def sheet_pdf(questions: int = 90, pages: int = None, seed: int = 0) -> bytes:
+    """The sheet as a PDF, its lines spread evenly over `pages` pages (default: as few as fit)."""
+    lines = sheet_lines(questions, seed)
+    pages = pages or -(-len(lines) // MAX_LINES_PER_PAGE)
+    per_page = -(-len(lines) // pages)
+    if per_page > MAX_LINES_PER_PAGE:
+        raise ValueError(f"{questions} questions need at least {-(-len(lines) // MAX_LINES_PER_PAGE)} pages")
+    return build_pdf([lines[i * per_page:(i + 1) * per_page] for i in range(pages)])
+
+
+def answer_key(questions: int = 90, seed: int = 0) -> list:
+    """An answer key for the sheet: a random correct option per MCQ, a number per SA question."""
+    rng = random.Random(f"key-{seed}")
+    key = []
+    for n in range(questions):
+        if _is_mcq(n):
+            correct = str(BASE_OPTION_ID + 4 * n + rng.randint(1, 4))
+        else:
+            correct = str(rng.randint(0, 999))
+        key.append({"id": str(BASE_QUESTION_ID + n), "correct_option": correct})
+    return key
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic response sheet PDF (or HTML page).")
+    parser.add_argument("output", help="a .html / .htm name writes the HTML page instead of a PDF")
+    parser.add_argument("--questions", type=int, default=90)
+    parser.add_argument("--pages", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--key", help="also write the matching answer key JSON here")
+    args = parser.parse_args()
+    with open(args.output, "wb") as f:
+        if args.output.lower().endswith((".html", ".htm")):
+            f.write(sheet_html(args.questions, args.seed))
+        else:
+            f.write(sheet_pdf(args.questions, args.pages, args.seed))
+    if args.key:
+        with open(args.key, "w") as f:
+            json.dump(answer_key(args.questions, args.seed), f)
+    print(f"Wrote {args.output} ({args.questions} questions)")
@@ -0,0 +1,195 @@
+import os
+import mmap
+import hashlib
+import tempfile
+import weakref
+from io import BytesIO
+from models import PARSE_LIMITS, ParseLimits
+
+# Uploads up to this size stay in memory; larger ones are spooled to a temp file and memory-mapped
+SPOOL_BYTES = int(os.environ.get("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+# Directory for spooled uploads (default: the system temp directory)
+SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR") or None
+CHUNK_BYTES = 256 * 1024
+# Upload names the parsers accept: PDF response sheets and the HTML pages they are printed from
+DOCUMENT_SUFFIXES = (".pdf", ".html", ".htm")
+
+
+def is_document_name(filename: str) -> bool:
+    return bool(filename) and filename.lower().endswith(DOCUMENT_SUFFIXES)
+
+
+def _remove(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class Upload:
+    """An ingested document: its content, size and SHA-256 digest.
+
+    Small uploads hold their bytes; larger ones live in a uniquely named
+    temp file that each reader memory-maps, so the content is never copied
+    into a Python object. `stream()` gives the parsers a seekable reader
+    over the content without copying it.
+
+    Pickling a spooled Upload (as ParseExecutor does to hand it to a parse
+    worker) sends only the file path; the worker maps the same file. The
+    temp file is removed by `close()`, or once the Upload that created it is
+    garbage collected; `hold_until` defers `close()` until a task that reads
+    the file has finished.
+    """
+
+    def __init__(self, data: bytes, digest: str):
+        self.data = data
+        self.size = len(data)
+        self.digest = digest
+        self.path = None
+        self._finalizer = None
+        self._holds = 0
+        self._closing = False
+
+    @classmethod
+    def _spooled(cls, path: str, size: int, digest: str, owner: bool) -> "Upload":
+        upload = cls.__new__(cls)
+        upload.data = None
+        upload.size = size
+        upload.digest = digest
+        upload.path = path
+        upload._finalizer = weakref.finalize(upload, _remove, path) if owner else None
+        upload._holds = 0
+        upload._closing = False
+        return upload
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __reduce__(self):
+        if self.path is None:
+            return Upload, (self.data, self.digest)
+        return Upload._spooled, (self.path, self.size, self.digest, False)
+
+    def stream(self):
+        """A seekable binary reader over the content, positioned at the start."""
+        if self.path is None:
+            return BytesIO(self.data)
+        # A fresh map per reader, so readers never share a file position
+        with open(self.path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def getvalue(self) -> bytes:
+        """The content as bytes (read from the temp file when spooled)."""
+        if self.path is None:
+            return self.data
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def close(self):
+        self._closing = True
+        if self._finalizer is not None and not self._holds:
+            self._finalizer()
+
+    def hold_until(self, future):
+        """Keep the temp file until `future` is done, even if `close()` is called first."""
+        self._holds += 1
+        future.add_done_callback(self._release)
+
+    def _release(self, _):
+        self._holds -= 1
+        if self._closing and not self._holds and self._finalizer is not None:
+            self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Spooler:
+    """Receives an upload chunk by chunk, hashing it and enforcing the size limit as it goes.
+
+    Content stays in memory until it exceeds `spool_bytes`, then moves to a
+    temp file in `spool_dir`. `finish()` returns the Upload; `abort()`
+    discards a partial one.
+    """
+
+    def __init__(self, limits: ParseLimits = None, spool_bytes: int = None, spool_dir: str = None):
+        self.limits = limits or PARSE_LIMITS
+        self.spool_bytes = SPOOL_BYTES if spool_bytes is None else spool_bytes
+        self.spool_dir = spool_dir or SPOOL_DIR
+        self._hash = hashlib.sha256()
+        self._chunks = []
+        self._file = None
+        self.size = 0
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        try:
+            self.limits.check_size(self.size)
+        except Exception:
+            self.abort()
+            raise
+        self._hash.update(chunk)
+        if self._file is None and self.size > self.spool_bytes:
+            self._file = tempfile.NamedTemporaryFile(prefix="upload-", suffix=".pdf", dir=self.spool_dir,
+                                                     delete=False)
+            self._file.writelines(self._chunks)
+            self._chunks = None
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._chunks.append(chunk)
+
+    def finish(self) -> Upload:
+        digest = self._hash.hexdigest()
+        if self._file is None:
+            return Upload(b"".join(self._chunks), digest)
+        self._file.close()
+        return Upload._spooled(self._file.name, self.size, digest, True)
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            os.unlink(self._file.name)
+            self._file = None
+        self._chunks = []
+
+
+async def ingest_upload(file, limits: ParseLimits = None) -> Upload:
+    """Read a FastAPI/Starlette UploadFile into an Upload, raising DocumentTooLarge past the limit.
+
+    The read stops at the first chunk over the limit, so an oversized upload
+    is never buffered whole.
+    """
+    spooler = Spooler(limits)
+    try:
+        while True:
+            chunk = await file.read(CHUNK_BYTES)
+            if not chunk:
+                break
+            spooler.write(chunk)
+    except BaseException:
+        spooler.abort()
+        raise
+    return spooler.finish()
+
+
+def ingest_stream(stream, limits: ParseLimits = None) -> Upload:
+    """Read a binary file object (e.g. a zip member) into an Upload; the blocking twin of ingest_upload."""
+    spooler = Spooler(limits)
+    try:
+        for chunk in iter(lambda: stream.read(CHUNK_BYTES), b""):
+            spooler.write(chunk)
+    except BaseException:
+        spooler.abort()
+        raise
+    return spooler.finish()
+
+
+def ingest_text(text: str, limits: ParseLimits = None) -> Upload:
+    """Wrap a document pasted as text (e.g. a response sheet's HTML) as an Upload."""
+    data = text.encode()
+    (limits or PARSE_LIMITS).check_size(len(data))
+    return Upload(data, hashlib.sha256(data).hexdigest())
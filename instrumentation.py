@@ -0,0 +1,94 @@
+import os
+import time
+import pstats
+import asyncio
+import cProfile
+import logging
+import tempfile
+import functools
+import contextvars
+from fastapi.routing import APIRoute
+from metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+# perf_counter() at which the current request's endpoint function returned
+_endpoint_done = contextvars.ContextVar("endpoint_done", default=None)
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that records the "serialization" stage.
+
+    That is the time between the endpoint function returning and its
+    response being ready: FastAPI's jsonable_encoder pass plus rendering
+    the JSON body.
+    """
+
+    def get_route_handler(self):
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call) and not getattr(call, "_timed", False):
+            @functools.wraps(call)
+            async def timed_call(*args, **kwargs):
+                result = await call(*args, **kwargs)
+                _endpoint_done.set(time.perf_counter())
+                return result
+            timed_call._timed = True
+            self.dependant.call = timed_call
+
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            done = _endpoint_done.get()
+            if done is not None:
+                observe_stage("serialization", time.perf_counter() - done)
+            return response
+        return timed_handler
+
+
+class RequestProfiler:
+    """Per-request cProfile dumps for requests that carry `header`.
+
+    Off unless `enabled`. The profile covers everything the event loop
+    thread runs while the request is in flight (other requests included),
+    but not work done in parse worker processes or threads, so it is meant
+    for a quiet instance. Only one request is profiled at a time. Dumps are
+    pstats files in `directory`.
+    """
+
+    def __init__(self, enabled: bool = False, directory: str = None, header: str = "X-Debug-Profile"):
+        self.enabled = enabled
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "checkmarks-profiles")
+        self.header = header
+        self._busy = False
+
+    def wanted(self, request) -> bool:
+        return self.enabled and not self._busy and request.headers.get(self.header, "") not in ("", "0")
+
+    async def run(self, request, call_next):
+        """Profile `call_next(request)`; returns (response, path of the pstats dump)."""
+        self._busy = True
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                response = await call_next(request)
+            finally:
+                profile.disable()
+            os.makedirs(self.directory, exist_ok=True)
+            name = request.url.path.strip("/").replace("/", "_") or "root"
+            path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{name}.prof")
+            profile.dump_stats(path)
+        finally:
+            self._busy = False
+        top = pstats.Stats(path).sort_stats("cumulative")
+        logger.info(f"Wrote request profile {path} ({top.total_calls} calls, {top.total_tt:.3f}s)")
+        return response, path
+
+
+def profiler_from_env() -> RequestProfiler:
+    """Build the profiler configured by REQUEST_PROFILING / PROFILE_DIR."""
+    return RequestProfiler(
+        enabled=os.environ.get("REQUEST_PROFILING", "0") not in ("", "0", "false"),
+        directory=os.environ.get("PROFILE_DIR") or None,
+    )
@@ -0,0 +1,183 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at its depth limit."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Job:
+    __slots__ = ("id", "kind", "filename", "status", "result", "error", "status_code",
+                 "created", "started", "finished", "done", "_run")
+
+    def __init__(self, kind: str, filename: str, run):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.filename = filename
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.status_code = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = asyncio.Event()
+        self._run = run
+
+    def to_dict(self) -> dict:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "filename": self.filename,
+            "status": self.status,
+            "timing": {
+                "created": self.created,
+                "queued_seconds": round((self.started or time.time()) - self.created, 4),
+                "run_seconds": round((self.finished or time.time()) - self.started, 4) if self.started else None,
+            },
+        }
+        if self.status == "done":
+            data["result"] = self.result
+        elif self.status == "failed":
+            data["status_code"] = self.status_code
+            data["detail"] = self.error
+        return data
+
+
+class JobQueue:
+    """In-process job queue with admission control.
+
+    At most `depth` jobs wait in the queue and `workers` run at once;
+    `submit` rejects immediately with JobQueueFull (carrying a Retry-After
+    estimate from recent run times) rather than letting work pile up.
+    Finished jobs stay pollable for `ttl` seconds, and at most `max_jobs`
+    are retained.
+    """
+
+    def __init__(self, depth: int = 100, workers: int = 4, ttl: float = 3600, max_jobs: int = 10000):
+        self.depth = depth
+        self.workers = workers
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._queue = None
+        self._tasks = []
+        self._running = 0
+        self._avg_run = None
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.depth)
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def check_admission(self):
+        """Raise JobQueueFull if a job submitted now would be rejected."""
+        if self._queue is not None and self._queue.full():
+            self.rejected += 1
+            raise JobQueueFull(f"{self._queue.qsize()} jobs already queued", self.retry_after())
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up."""
+        avg = self._avg_run if self._avg_run is not None else 1.0
+        waiting = self._queue.qsize() if self._queue is not None else 0
+        return max(1, round(avg * (waiting + self._running) / max(self.workers, 1)))
+
+    def submit(self, kind: str, filename: str, run) -> Job:
+        """Queue `run()` (a coroutine function returning the job result)."""
+        if self._queue is None:
+            raise RuntimeError("Job queue is not started")
+        job = Job(kind, filename, run)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise JobQueueFull(f"{self._queue.qsize()} jobs already queued", self.retry_after())
+        self._expire()
+        self._jobs[job.id] = job
+        self.submitted += 1
+        return job
+
+    def get(self, job_id: str):
+        self._expire()
+        return self._jobs.get(job_id)
+
+    def _expire(self):
+        now = time.time()
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            finished = job.finished is not None
+            if finished and (len(self._jobs) >= self.max_jobs or now - job.finished > self.ttl):
+                self._jobs.popitem(last=False)
+            else:
+                break
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            self._running += 1
+            job.status = "running"
+            job.started = time.time()
+            try:
+                job.result = await job._run()
+                job.status = "done"
+                self.completed += 1
+            except asyncio.CancelledError:
+                job.status, job.status_code, job.error = "failed", 503, "Server shutting down"
+                raise
+            except Exception as e:
+                job.status = "failed"
+                job.status_code = getattr(e, "status_code", 500)
+                job.error = getattr(e, "detail", None) or str(e)
+                self.failed += 1
+                logger.error(f"Job {job.id} failed: {job.error}")
+            finally:
+                job.finished = time.time()
+                job._run = None
+                run = job.finished - job.started
+                self._avg_run = run if self._avg_run is None else 0.8 * self._avg_run + 0.2 * run
+                self._running -= 1
+                job.done.set()
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            "retained": len(self._jobs),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_run_seconds": self._avg_run,
+        }
+
+
+def job_queue_from_env(default_workers: int) -> JobQueue:
+    """Build the queue configured by the JOB_* environment variables."""
+    return JobQueue(
+        depth=int(os.environ.get("JOB_QUEUE_DEPTH", "100")),
+        workers=int(os.environ.get("JOB_WORKERS", "0")) or default_workers,
+        ttl=float(os.environ.get("JOB_RESULT_TTL", "3600")),
+        max_jobs=int(os.environ.get("JOB_MAX_RETAINED", "10000")),
+    )
@@ -1,9 +1,189 @@
-from locust import HttpUser, task, between
+"""Load test for the grading endpoints, using synthetic response sheets.
 
-class PDFUser(HttpUser):
+Setup (no student PDFs or Google Drive needed):
+
+    python locustfile.py keys loadtest_keys
+    ANSWER_KEY_SOURCE=local ANSWER_KEY_DIR=loadtest_keys uvicorn app:app --port 8000
+    locust -f locustfile.py --host http://127.0.0.1:8000 --headless
+
+`keys` writes one answer key per sheet size for the local key source,
+under made-up exam dates (01_01_30, 01_01_90, 01_03_00) that no real
+key uses.
+
+Each simulated user posts sheets to /extract/mcq, /extract/sa and
+/extract/all (weights 3:2:5). Sheets have 30, 90 or 300 questions (weights
+1:3:1). LOADTEST_REPEAT_RATIO (default 0.3) of the uploads come from a
+small fixed pool and are reported as "<endpoint> [repeat]", to show what
+the parsed result cache saves. The rest are fresh sheets that must be
+parsed.
+
+The run steps through LOADTEST_USERS concurrent users (default 1,4,8,16),
+LOADTEST_STEP_SECONDS (default 60) each. At the end it prints p50/p95/p99
+latency and throughput per endpoint and per concurrency level and writes
+them to LOADTEST_REPORT (default loadtest_report.json). Run it as a single
+locust process; the report only sees this process's requests.
+"""
+import os
+import sys
+import json
+import time
+import random
+import itertools
+from collections import defaultdict
+from locust import HttpUser, LoadTestShape, between, events, task
+from benchmarks.synthetic import sheet_pdf, answer_key
+
+# questions per sheet: weight
+SHEET_SIZES = {30: 1, 90: 3, 300: 1}
+# questions per sheet: exam date of its answer key (DD_MM_YY, as the endpoints require)
+EXAM_DATES = {30: "01_01_30", 90: "01_01_90", 300: "01_03_00"}
+# Sheets per size in the repeat pool
+HOT_SHEETS = 4
+REPEAT_RATIO = float(os.environ.get("LOADTEST_REPEAT_RATIO", "0.3"))
+USER_LEVELS = [int(n) for n in os.environ.get("LOADTEST_USERS", "1,4,8,16").split(",")]
+STEP_SECONDS = float(os.environ.get("LOADTEST_STEP_SECONDS", "60"))
+REPORT_PATH = os.environ.get("LOADTEST_REPORT", "loadtest_report.json")
+
+
+def exam_date(questions: int) -> str:
+    """The made-up exam date whose answer key fits sheets of `questions` questions."""
+    return EXAM_DATES[questions]
+
+
+def write_answer_keys(directory: str):
+    """One answer key per sheet size; the key seed is shared by every sheet of that size."""
+    os.makedirs(directory, exist_ok=True)
+    for questions in SHEET_SIZES:
+        with open(os.path.join(directory, f"{exam_date(questions)}.json"), "w") as f:
+            json.dump(answer_key(questions), f)
+
+
+_hot_sheets = {}
+# Fresh sheets get seeds no earlier run used, so they miss a persistent (disk) result cache too
+_fresh_seeds = itertools.count(random.randrange(1 << 30) + HOT_SHEETS)
+
+
+def pick_sheet():
+    """Return (questions, pdf bytes, repeat) for the next upload."""
+    questions = random.choices(list(SHEET_SIZES), weights=list(SHEET_SIZES.values()))[0]
+    if random.random() < REPEAT_RATIO:
+        seed = random.randrange(HOT_SHEETS)
+        pdf = _hot_sheets.get((questions, seed))
+        if pdf is None:
+            pdf = _hot_sheets[questions, seed] = sheet_pdf(questions, seed=seed)
+        return questions, pdf, True
+    return questions, sheet_pdf(questions, seed=next(_fresh_seeds)), False
+
+
+def _percentile(ordered: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(0, int(-(-len(ordered) * pct // 100)) - 1)]
+
+
+class LevelRecorder:
+    """Response times grouped by (concurrency level, request name), for the end-of-run report."""
+
+    def __init__(self):
+        self.level = None
+        self.spans = {}
+        self.samples = defaultdict(list)
+        self.failures = defaultdict(int)
+
+    def enter(self, users: int):
+        now = time.monotonic()
+        if users != self.level:
+            self.spans.setdefault(users, [now, now])
+            self.level = users
+        self.spans[users][1] = now
+
+    def record(self, name: str, response_time: float, failed: bool):
+        if self.level is None:
+            return
+        self.samples[self.level, name].append(response_time)
+        if failed:
+            self.failures[self.level, name] += 1
+
+    def report(self) -> list:
+        rows = []
+        for (users, name), times in sorted(self.samples.items()):
+            start, end = self.spans[users]
+            ordered = sorted(times)
+            rows.append({
+                "users": users,
+                "name": name,
+                "requests": len(ordered),
+                "failures": self.failures[users, name],
+                "p50_ms": round(_percentile(ordered, 50), 1),
+                "p95_ms": round(_percentile(ordered, 95), 1),
+                "p99_ms": round(_percentile(ordered, 99), 1),
+                "rps": round(len(ordered) / max(end - start, 1e-9), 2),
+            })
+        return rows
+
+
+recorder = LevelRecorder()
+
+
+@events.request.add_listener
+def record_request(name, response_time, exception, **kwargs):
+    recorder.record(name, response_time, exception is not None)
+
+
+@events.test_stop.add_listener
+def write_report(environment, **kwargs):
+    rows = recorder.report()
+    if not rows:
+        return
+    print(f"{'users':>5}  {'endpoint':26s} {'reqs':>6} {'fail':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'req/s':>7}")
+    for row in rows:
+        print(f"{row['users']:5d}  {row['name']:26s} {row['requests']:6d} {row['failures']:5d} "
+              f"{row['p50_ms']:8.1f} {row['p95_ms']:8.1f} {row['p99_ms']:8.1f} {row['rps']:7.2f}")
+    with open(REPORT_PATH, "w") as f:
+        json.dump({"levels": USER_LEVELS, "step_seconds": STEP_SECONDS, "repeat_ratio": REPEAT_RATIO,
+                   "results": rows}, f, indent=2)
+    print(f"Wrote {REPORT_PATH}")
+
+
+class SteppedLoad(LoadTestShape):
+    """Hold each of USER_LEVELS concurrent users for STEP_SECONDS, then stop."""
+
+    def tick(self):
+        step = int(self.get_run_time() // STEP_SECONDS)
+        if step >= len(USER_LEVELS):
+            return None
+        users = USER_LEVELS[step]
+        recorder.enter(users)
+        return users, users
+
+
+class GraderUser(HttpUser):
     wait_time = between(1, 2)
 
-    @task
-    def upload_pdf(self):
-        with open("test.pdf", "rb") as pdf:
-            self.client.post("/extract/mcq", files={"file": pdf})
\ No newline at end of file
+    def upload(self, path: str):
+        questions, pdf, repeat = pick_sheet()
+        name = f"{path} [repeat]" if repeat else path
+        with self.client.post(path, files={"file": (f"sheet-{questions}.pdf", pdf, "application/pdf")},
+                              data={"date": exam_date(questions)}, name=name, catch_response=True) as response:
+            if response.status_code != 200:
+                response.failure(f"{response.status_code}: {response.text[:200]}")
+
+    @task(3)
+    def extract_mcq(self):
+        self.upload("/extract/mcq")
+
+    @task(2)
+    def extract_sa(self):
+        self.upload("/extract/sa")
+
+    @task(5)
+    def extract_all(self):
+        self.upload("/extract/all")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "keys":
+        write_answer_keys(sys.argv[2])
+        print(f"Wrote answer keys for {', '.join(exam_date(q) for q in SHEET_SIZES)} to {sys.argv[2]}")
+    else:
+        print(__doc__)
@@ -1,87 +1,110 @@
 import os
-import json
+import time
 import asyncio
 import logging
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.responses import JSONResponse
 import uvicorn
-import pandas as pd
-from models import extract_mcq_from_pdf, extract_sa_from_pdf
+from models import parse_mcq_records, parse_sa_records, DocumentRejected, PARSE_LIMITS
+from ingest import ingest_upload, is_document_name
+from parse_executor import executor_from_env, ParseQueueFull
+from scoring import score_mcq
+from answer_keys import index_from_file
+from sample_sheet import SAMPLE_PDF, SAMPLE_MCQ
 
 app = FastAPI(title="PDF Question Extractor API", 
               description="API for extracting MCQ and Short Answer questions from PDF files")
 
 logger = logging.getLogger(__name__)
 
-async def save_temp_file(file: UploadFile):
-    """Save uploaded file to a temporary location asynchronously."""
-    contents = await file.read()
-    print("File signature:", contents[:10])
-    os.makedirs("temp_uploads", exist_ok=True)
-    temp_path = os.path.join("temp_uploads", file.filename)
-    with open(temp_path, "wb") as f:
-        f.write(contents)
-    return temp_path
+parse_executor = executor_from_env()
+
+# Answer key compiled during warm-up; the default of the endpoints' answer_key_path
+DEFAULT_ANSWER_KEY = "answer_key.json"
+
+# Progress of the startup warm-up, reported by /ready
+warmup = {"status": "pending", "seconds": None, "steps": {}, "error": None}
+warmup_tasks = set()
+
+
+@app.on_event("startup")
+async def start_warm_up():
+    # Runs in the background so the server is up (and /ready answers) while workers warm
+    task = asyncio.ensure_future(warm_up())
+    warmup_tasks.add(task)
+    task.add_done_callback(warmup_tasks.discard)
+
+
+async def warm_up():
+    """Start and warm the parse workers, parse the embedded sample sheet and compile the answer key.
+
+    /ready reports ready once this finishes.
+    """
+    started = time.perf_counter()
+    steps = warmup["steps"]
+    warmup["status"] = "running"
+    try:
+        t = time.perf_counter()
+        await asyncio.to_thread(parse_executor.start)
+        steps["parse_executor"] = {"workers": parse_executor.workers, "seconds": round(time.perf_counter() - t, 3)}
+
+        t = time.perf_counter()
+        mcq_data = await parse_executor.run(parse_mcq_records, SAMPLE_PDF)
+        if len(mcq_data) != SAMPLE_MCQ:
+            raise RuntimeError(f"Sample sheet parsed to {len(mcq_data)} MCQ questions")
+        steps["sample_parse"] = {"seconds": round(time.perf_counter() - t, 3)}
+
+        if os.path.exists(DEFAULT_ANSWER_KEY):
+            t = time.perf_counter()
+            await asyncio.to_thread(index_from_file, DEFAULT_ANSWER_KEY, "question_id", "correct_option_id")
+            steps["answer_key"] = {"path": DEFAULT_ANSWER_KEY, "seconds": round(time.perf_counter() - t, 3)}
+        warmup["status"] = "ready"
+    except Exception as e:
+        warmup["status"] = "failed"
+        warmup["error"] = str(e)
+        logger.error(f"Warm-up failed: {e}")
+    finally:
+        warmup["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Warm-up {warmup['status']} after {warmup['seconds']}s")
+
+
+@app.on_event("shutdown")
+async def stop_parse_executor():
+    for task in warmup_tasks:
+        task.cancel()
+    await asyncio.to_thread(parse_executor.shutdown)
+
 
 @app.post("/extract/mcq", response_class=JSONResponse)
-async def extract_mcq(file: UploadFile = File(...), answer_key_path: str = "answer_key.json"):
+async def extract_mcq(file: UploadFile = File(...), answer_key_path: str = DEFAULT_ANSWER_KEY):
     """Extract MCQs and calculate scores."""
-    if not file.filename.endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="File must be a PDF")
+    if not is_document_name(file.filename):
+        raise HTTPException(status_code=400, detail="File must be a PDF or HTML response sheet")
     
     if not os.path.exists(answer_key_path):
         raise HTTPException(status_code=400, detail="Answer key file not found")
 
-    temp_path = await save_temp_file(file)
-    file.file.seek(0)
-    
     try:
-        # Process the PDF asynchronously
-        mcq_data = await asyncio.to_thread(extract_mcq_from_pdf, temp_path)
-        if not isinstance(mcq_data, pd.DataFrame):
+        # Process the PDF in the parse executor
+        mcq_data = await parse_executor.run(parse_mcq_records, await ingest_upload(file, PARSE_LIMITS))
+        if not isinstance(mcq_data, list):
             raise HTTPException(status_code=500, detail="MCQ extraction failed")
 
-        # Load answer key
-        with open(answer_key_path, 'r') as f:
-            answer_key = json.load(f)
-        
-        answer_key_dict = {item["question_id"]: item["correct_option_id"] for item in answer_key}
-
-        correct_count = incorrect_count = skipped_count = total_score = 0
-        mcq_result = []
-
-        for _, row in mcq_data.iterrows():
-            question_id = row.get("question_id")
-            chosen_option_id = row.get("chosen_option_id", "")
-
-            if question_id not in answer_key_dict:
-                continue
-
-            if not chosen_option_id:
-                skipped_count += 1
-            elif chosen_option_id == answer_key_dict[question_id]:
-                correct_count += 1
-                total_score += 4
-            else:
-                incorrect_count += 1
-                total_score -= 1
-
-            mcq_result.append(row.to_dict())
-
-        os.remove(temp_path)  # Clean up temp file
+        # Compiled once per answer key file, recompiled only when the file changes
+        answer_index = index_from_file(answer_key_path, "question_id", "correct_option_id")
+        scores = score_mcq(answer_index, [q.question_id for q in mcq_data],
+                           [q.chosen_option_id for q in mcq_data])
+        mcq_result = [q.to_dict() for q, found in zip(mcq_data, scores.found) if found]
 
         return {
             "mcq_data": mcq_result,
             "filename": file.filename,
-            "score_summary": {
-                "correct_questions": correct_count,
-                "incorrect_questions": incorrect_count,
-                "skipped_questions": skipped_count,
-                "total_questions": len(mcq_data),
-                "total_score": total_score,
-                "scoring_system": "+4 for correct, -1 for incorrect, 0 for skipped"
-            }
+            "score_summary": scores.summary(total_questions=len(mcq_data))
         }
+    except ParseQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Server busy: {str(e)}")
+    except DocumentRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing PDF: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
@@ -89,23 +112,22 @@ async def extract_mcq(file: UploadFile = File(...), answer_key_path: str = "answ
 @app.post("/extract/sa", response_class=JSONResponse)
 async def extract_sa(file: UploadFile = File(...)):
     """Extract Short Answer Questions asynchronously."""
-    if not file.filename.endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="File must be a PDF")
-
-    temp_path = await save_temp_file(file)
-    file.file.seek(0)
+    if not is_document_name(file.filename):
+        raise HTTPException(status_code=400, detail="File must be a PDF or HTML response sheet")
 
     try:
-        sa_data = await asyncio.to_thread(extract_sa_from_pdf, temp_path)
-        if not isinstance(sa_data, pd.DataFrame):
+        sa_data = await parse_executor.run(parse_sa_records, await ingest_upload(file, PARSE_LIMITS))
+        if not isinstance(sa_data, list):
             raise HTTPException(status_code=500, detail="Short answer extraction failed")
 
-        os.remove(temp_path)  # Clean up temp file
-
         return {
-            "sa_data": sa_data.to_dict(orient='records'),
+            "sa_data": [{"question_id": q, "answer": a, "question": ""} for q, a in sa_data],
             "filename": file.filename
         }
+    except ParseQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Server busy: {str(e)}")
+    except DocumentRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing PDF: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
@@ -114,6 +136,23 @@ async def extract_sa(file: UploadFile = File(...)):
 async def root():
     return {"message": "Welcome to the PDF Question Extractor API. Use /extract/mcq or /extract/sa endpoints."}
 
+
+@app.get("/ready")
+async def ready():
+    """200 once the startup warm-up has finished, 503 (with its progress) until then.
+
+    Also 503 while the parse worker pool is broken; the probe then tries to
+    start a fresh one.
+    """
+    if parse_executor.broken:
+        try:
+            await asyncio.to_thread(parse_executor.start)
+        except Exception as e:
+            logger.error(f"Could not restart the parse workers: {e}")
+    body = {"ready": warmup["status"] == "ready" and not parse_executor.broken, **warmup,
+            "parse_executor_broken": parse_executor.broken}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run("main:app", host="0.0.0.0", port=port)
\ No newline at end of file
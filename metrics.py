@@ -0,0 +1,158 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Seconds; covers a cached lookup (sub-millisecond) up to a long accurate-backend parse
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, values)} {_number(total)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, counts):
+                    cumulative += bucket
+                    labels = _labels(self.labels, values, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _labels(self.labels, values, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, values)} {total!r}")
+                lines.append(f"{self.name}_count{_labels(self.labels, values)} {count}")
+        return lines
+
+
+class Gauge:
+    """A value read from `fn()` (a number, or {label_values: number}) each time metrics are scraped."""
+
+    def __init__(self, name: str, help: str, fn, labels: tuple = (), kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labels = labels
+        self.kind = kind
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        value = self.fn()
+        for values, number in (sorted(value.items()) if isinstance(value, dict) else [((), value)]):
+            lines.append(f"{self.name}{_labels(self.labels, values)} {_number(number or 0)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "checkmarks_stage_seconds", "Time spent in each stage of handling a request.", ("stage",)))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "checkmarks_request_seconds", "Request latency by route.", ("method", "route", "status")))
+REQUESTS = REGISTRY.register(Counter(
+    "checkmarks_requests_total", "Requests handled, by route and status.", ("method", "route", "status")))
+
+# The stages of the current request, {stage: seconds}; None outside a request
+_request_stages = contextvars.ContextVar("request_stages", default=None)
+
+
+def start_request() -> dict:
+    """Begin collecting stage timings for the current request (and the tasks it starts)."""
+    stages = {}
+    _request_stages.set(stages)
+    return stages
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record `seconds` spent in `stage`, in the histogram and the current request's timings."""
+    STAGE_SECONDS.observe(seconds, stage)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as `stage` (see observe_stage)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def server_timing(stages: dict) -> str:
+    """Stage timings as a Server-Timing header value (durations in milliseconds)."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in stages.items())
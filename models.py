@@ -1,8 +1,15 @@
 from io import BytesIO
-import pandas as pd
-import pdfplumber
+import os
 import re
+import time
+import codecs
 import logging
+from html.parser import HTMLParser
+from typing import NamedTuple
+
+# pdfplumber / pdfminer are imported where pages are read, so that importing
+# this module (as the API process does) does not load the PDF stack; parse
+# workers load it when they warm up.
 
 # Set up logging
 logging.basicConfig(level=logging.INFO,
@@ -14,180 +21,941 @@ class JEEExamParser:
 
     def __init__(self, pdf_bytes: BytesIO):
         """Initialize with PDF bytes."""
-        # Convert to BytesIO if needed
-        if isinstance(pdf_bytes, str):
-            pdf_bytes = BytesIO(pdf_bytes.encode())
-        elif isinstance(pdf_bytes, bytes):
-            pdf_bytes = BytesIO(pdf_bytes)
-            
-        self.pdf_bytes = pdf_bytes
+        self.pdf_bytes = open_pdf(pdf_bytes)
         self.exam_data = []
+        # Pages read and skipped by the last parse_exam_pdf (see stream_records)
+        self.pages = {}
 
     def extract_text_from_pdf(self) -> str:
         """Extract all text from the PDF."""
-        full_text = ""
-        try:
-            with pdfplumber.open(self.pdf_bytes) as pdf:
-                for page_num, page in enumerate(pdf.pages, 1):
-                    page_text = page.extract_text()
-                    if page_text:
-                        full_text += page_text + "\n"
-                    logger.info(f"Processed page {page_num}/{len(pdf.pages)}")
-
-            if not full_text:
-                logger.error("Extracted text is empty")
-            else:
-                logger.info(f"Successfully extracted {len(full_text)} characters from PDF")
-
-            return full_text
-        except Exception as e:
-            logger.error(f"Error extracting text from PDF: {e}")
-            return ""
+        return extract_pdf_text(self.pdf_bytes)
 
     def find_all_questions(self, text: str):
         """Find all questions in the text, focusing only on MCQs."""
-        all_questions = []
-        question_sections = re.split(r"Question Type\s*:\s*MCQ", text)[1:]
-
-        for i, section in enumerate(question_sections):
-            id_match = re.search(r"Question ID\s*:\s*(\d+)", section)
-            if not id_match:
-                logger.warning(f"Could not find Question ID in section {i+1}")
-                continue
-
-            question_id = id_match.group(1)
-            q_data = self.extract_mcq_data(section, question_id)
-            if q_data:
-                all_questions.append(q_data)
-
+        all_questions, _ = scan_questions(text)
         logger.info(f"Found {len(all_questions)} MCQ questions in total")
         return all_questions
 
-    def extract_mcq_data(self, section: str, question_id: str):
-        """Extract data for an MCQ question from its section."""
-        try:
-            data = {"type": "mcq", "question_id": question_id}
-            option_pattern = r"Option (\d) ID\s*:\s*(\d+)"
-            option_matches = re.finditer(option_pattern, section)
-            option_id_map = {}
-
-            for match in option_matches:
-                option_num = match.group(1)
-                option_id = match.group(2)
-                data[f"option_{option_num}_id"] = option_id
-                option_id_map[option_num] = option_id
-
-            for i in range(1, 5):
-                if f"option_{i}_id" not in data:
-                    data[f"option_{i}_id"] = ""
-
-            status_match = re.search(r"Status\s*:\s*(.*?)(?=Chosen|\n|$)", section, re.DOTALL)
-            data["status"] = status_match.group(1).strip() if status_match else "Not Answered"
-
-            chosen_match = re.search(r"Chosen Option\s*:\s*(\S*)", section)
-            chosen_option_num = chosen_match.group(1).strip() if chosen_match else ""
-            data["chosen_option"] = chosen_option_num
-
-            if chosen_option_num and chosen_option_num in option_id_map:
-                data["chosen_option_id"] = option_id_map[chosen_option_num]
-            else:
-                data["chosen_option_id"] = ""
-
-            data["given_answer"] = ""
-            return data
-        except Exception as e:
-            logger.error(f"Error extracting MCQ data for question {question_id}: {e}")
-            return None
+    def parse_exam_text(self, full_text: str):
+        """Extract all MCQ question data from already extracted text."""
+        self.exam_data = self.find_all_questions(full_text)
+        self.exam_data.sort(key=MCQRecord.sort_key)
+        return self.exam_data
 
-    def parse_exam_pdf(self):
-        """Parse the entire PDF and extract all question data."""
-        full_text = self.extract_text_from_pdf()
-        if not full_text:
+    def parse_exam_pdf(self, question_ids=None, idle_pages: int = None):
+        """Parse the PDF and extract all MCQ question data.
+
+        Each page's text goes to the question scanner as soon as it is
+        extracted. Reading stops once every ID in `question_ids` (e.g. the
+        answer key's) has been found, or after `idle_pages` pages without
+        question markers (default: IDLE_PAGES with `question_ids`, else
+        never); `self.pages` reports how many pages were skipped.
+        """
+        self.pages = {}
+        idle_pages = default_idle_pages(question_ids) if idle_pages is None else idle_pages
+        records = stream_records(self.pdf_bytes, "accurate", question_ids=question_ids, idle_pages=idle_pages,
+                                 pages=self.pages)
+        self.exam_data = [record for kind, record in records if kind == "mcq"]
+        if not self.exam_data and not self.pages.get("read"):
             logger.error("No text extracted from PDF")
             return []
-
-        self.exam_data = self.find_all_questions(full_text)
-        self.exam_data.sort(key=lambda x: int(x.get("question_id", "0")))
+        logger.info(f"Found {len(self.exam_data)} MCQ questions in total")
+        self.exam_data.sort(key=MCQRecord.sort_key)
         return self.exam_data
 
-def extract_text_from_pdf_bytes(pdf_bytes: BytesIO) -> list:
-    """Extract text from PDF bytes and return as a list of lines."""
-    try:
-        # Convert to BytesIO if string is received
-        if isinstance(pdf_bytes, str):
-            pdf_bytes = BytesIO(pdf_bytes.encode())
-        elif isinstance(pdf_bytes, bytes):
-            pdf_bytes = BytesIO(pdf_bytes)
-            
-        # Reset buffer position
+# One alternation per field the parsers read; each named outer group marks the token kind.
+# The leading lookahead lets the engine skip positions that cannot start a token.
+# The Status/Chosen values must not run into the next MCQ marker, which the old
+# per-section regexes could never see.
+_TOKEN_RE = re.compile(
+    r"(?=[QOSCG])(?:"
+    r"(?P<mcq>Question Type\s*:\s*MCQ)"
+    r"|(?P<qid>Question ID\s*:\s*(?P<qid_value>\d+))"
+    r"|(?P<option>Option (?P<option_num>\d) ID\s*:\s*(?P<option_id>\d+))"
+    r"|(?P<status>Status\s*:\s*(?P<status_value>.*?)(?=Chosen|\n|$|Question Type\s*:\s*MCQ))"
+    r"|(?P<chosen>Chosen Option\s*:\s*(?P<chosen_value>(?!Question Type\s*:\s*MCQ)\S*))"
+    r"|(?P<given>Given(?P<given_value>\d+)?)"
+    r")"
+)
+
+
+class MCQRecord:
+    """One parsed MCQ response.
+
+    Holds only the fields the parser reads (the four option IDs as a tuple);
+    `to_dict` gives the row shape JEEExamParser has always produced.
+    """
+    __slots__ = ("question_id", "option_ids", "status", "chosen_option", "chosen_option_id")
+
+    def __init__(self, question_id: str, option_ids: tuple, status: str, chosen_option: str, chosen_option_id: str):
+        self.question_id = question_id
+        self.option_ids = option_ids
+        self.status = status
+        self.chosen_option = chosen_option
+        self.chosen_option_id = chosen_option_id
+
+    def _fields(self) -> tuple:
+        return (self.question_id, self.option_ids, self.status, self.chosen_option, self.chosen_option_id)
+
+    def __eq__(self, other):
+        if not isinstance(other, MCQRecord):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"MCQRecord(question_id={self.question_id!r}, chosen_option_id={self.chosen_option_id!r})"
+
+    def sort_key(self) -> int:
+        return int(self.question_id or "0")
+
+    def to_dict(self) -> dict:
+        option_1_id, option_2_id, option_3_id, option_4_id = self.option_ids
+        return {
+            "type": "mcq",
+            "question_id": self.question_id,
+            "option_1_id": option_1_id,
+            "option_2_id": option_2_id,
+            "option_3_id": option_3_id,
+            "option_4_id": option_4_id,
+            "status": self.status,
+            "chosen_option": self.chosen_option,
+            "chosen_option_id": self.chosen_option_id,
+            "given_answer": "",
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MCQRecord":
+        return cls(data["question_id"], tuple(data.get(f"option_{i}_id", "") for i in range(1, 5)),
+                   data["status"], data["chosen_option"], data["chosen_option_id"])
+
+
+class SARecord(NamedTuple):
+    """One parsed short answer; unpacks like the (question_id, answer) tuples it replaces."""
+    question_id: str
+    answer: str
+
+
+def _mcq_record(question_id: str, options: dict, status, chosen_option_num) -> MCQRecord:
+    chosen_option_num = chosen_option_num.strip() if chosen_option_num is not None else ""
+    return MCQRecord(
+        question_id,
+        (options.get("1", ""), options.get("2", ""), options.get("3", ""), options.get("4", "")),
+        status.strip() if status is not None else "Not Answered",
+        chosen_option_num,
+        options.get(chosen_option_num, "") if chosen_option_num else "",
+    )
+
+
+def plain_records(records: dict) -> dict:
+    """The JSON-ready form of a parse result: MCQ rows as dicts, SA records as pairs, and its "pages" report."""
+    return {"mcq": [q.to_dict() for q in records["mcq"]], "sa": list(records["sa"]), "pages": records.get("pages")}
+
+
+def typed_records(data: dict) -> dict:
+    """Rebuild a parse result from its plain_records form."""
+    return {"mcq": [MCQRecord.from_dict(q) for q in data["mcq"]],
+            "sa": [SARecord(question_id, answer) for question_id, answer in data["sa"]],
+            "pages": data.get("pages")}
+
+
+def mcq_frame(mcq_records: list):
+    """A pandas DataFrame of MCQ records with the MCQ_COLUMNS, for CSV export.
+
+    pandas is imported here rather than at module level, so parsing and
+    scoring never load it.
+    """
+    import pandas as pd
+    return pd.DataFrame([q.to_dict() for q in mcq_records], columns=MCQ_COLUMNS)
+
+
+class QuestionScanner:
+    """Incremental form of scan_questions, fed one page of text at a time.
+
+    `feed` returns the records completed so far: an MCQ record once the next
+    "Question Type : MCQ" marker is seen, an SA answer once its Question ID
+    is. `close` flushes whatever is still open. Feeding the pages of a
+    document in order gives the same records as scanning the joined text,
+    as long as no single token is split across two feeds.
+    """
+
+    def __init__(self):
+        self.in_mcq = False
+        self.question_id = self.options = self.status = self.chosen = None
+        self.sections = 0
+        # Question Type / Question ID tokens seen so far
+        self.markers = 0
+
+        self.given_values = []
+        self.pending = []
+        self.sa_question_id = None
+        self.last_given_line = -1
+        self.sa_emitted = 0
+        self.line = 0
+
+    def _close_section(self, mcq_records: list):
+        if self.question_id is not None:
+            mcq_records.append(_mcq_record(self.question_id, self.options, self.status, self.chosen))
+        else:
+            logger.warning(f"Could not find Question ID in section {self.sections}")
+
+    def _take_sa(self, upto: int) -> list:
+        done = [SARecord(qid, value) for qid, value, _ in self.given_values[self.sa_emitted:upto]]
+        self.sa_emitted = upto
+        return done
+
+    def feed(self, text: str):
+        """Scan the next piece of text; return (mcq_records, sa_records) completed by it."""
+        mcq_records = []
+        given_values = self.given_values
+        pending = self.pending
+
+        line = self.line
+        line_pos = 0
+        for m in _TOKEN_RE.finditer(text):
+            kind = m.lastgroup
+            if kind == "given" or (kind == "qid" and pending):
+                # Line numbers are only needed for the SA pairing rules
+                start = m.start()
+                line += text.count("\n", line_pos, start)
+                line_pos = start
+
+            if kind == "mcq" or kind == "qid":
+                self.markers += 1
+            if kind == "mcq":
+                if self.in_mcq:
+                    self._close_section(mcq_records)
+                self.in_mcq = True
+                self.sections += 1
+                self.question_id = self.status = self.chosen = None
+                self.options = {}
+            elif kind == "qid":
+                value = m.group("qid_value")
+                if self.in_mcq and self.question_id is None:
+                    self.question_id = value
+                if pending and m.group("qid") == "Question ID :" + value:
+                    keep = []
+                    for index in pending:
+                        if given_values[index][2] < line:
+                            given_values[index] = (value, given_values[index][1], line)
+                        else:
+                            keep.append(index)
+                    if len(keep) != len(pending):
+                        self.sa_question_id = value
+                        # Givens earlier on this line wait for a later ID but, like any Given
+                        # after this one, default to it
+                        for index in keep:
+                            given_values[index] = (value, given_values[index][1], given_values[index][2])
+                        pending[:] = keep
+            elif kind == "option":
+                if self.in_mcq:
+                    self.options[m.group("option_num")] = m.group("option_id")
+            elif kind == "status":
+                if self.in_mcq and self.status is None:
+                    self.status = m.group("status_value")
+            elif kind == "chosen":
+                if self.in_mcq and self.chosen is None:
+                    self.chosen = m.group("chosen_value")
+            elif kind == "given":
+                if line != self.last_given_line:
+                    self.last_given_line = line
+                    pending.append(len(given_values))
+                    given_values.append((self.sa_question_id, m.group("given_value") or "NULL", line))
+
+        self.line = line + text.count("\n", line_pos)
+        # Answers before the first unpaired Given are final
+        return mcq_records, self._take_sa(pending[0] if pending else len(given_values))
+
+    def open_question(self):
+        """The Question ID of the open MCQ section once its Status and Chosen Option are read, else None."""
+        if self.in_mcq and self.status is not None and self.chosen is not None:
+            return self.question_id
+        return None
+
+    def close(self):
+        """Flush the open MCQ section and any SA answers still waiting for an ID."""
+        mcq_records = []
+        if self.in_mcq:
+            self._close_section(mcq_records)
+            self.in_mcq = False
+        self.pending.clear()
+        return mcq_records, self._take_sa(len(self.given_values))
+
+
+def scan_questions(text: str):
+    """Tokenize the extracted text once and return (mcq_records, sa_records).
+
+    MCQ records are MCQRecords sorted by question ID: a question runs from one "Question Type : MCQ" marker to the
+    next and takes the first Question ID, Status and Chosen Option in that
+    span. SA records are (question_id, answer) SARecords pairing each line's
+    first "Given" with the next "Question ID :" on a later line, exactly as
+    parse_sa_lines does.
+    """
+    scanner = QuestionScanner()
+    mcq_records, sa_records = scanner.feed(text)
+    mcq_tail, sa_tail = scanner.close()
+    mcq_records += mcq_tail
+    sa_records += sa_tail
+    mcq_records.sort(key=MCQRecord.sort_key)
+    return mcq_records, sa_records
+
+
+def _parse_region(value: str):
+    """Parse "x0,top,x1,bottom" page fractions (e.g. "0.5,0,1,1" for the right half)."""
+    if not value:
+        return None
+    region = tuple(float(part) for part in value.split(","))
+    if len(region) != 4:
+        raise ValueError(f"PDF_TEXT_REGION needs 4 comma-separated fractions, got: {value}")
+    return region
+
+
+# "fast" reads pdfminer's char stream without layout analysis; "accurate" is pdfplumber's extract_text
+TEXT_BACKEND = os.environ.get("PDF_TEXT_BACKEND", "fast")
+# Optional part of each page holding the response table, used by the fast backend
+TEXT_REGION = _parse_region(os.environ.get("PDF_TEXT_REGION"))
+# Share of the expected questions the fast backend must find before its result is trusted
+FAST_MIN_RATIO = float(os.environ.get("PDF_FAST_MIN_RATIO", "0.9"))
+# When parsing against an answer key, stop reading a PDF after this many pages in a row without
+# question markers, once questions began; 0 = never. Parses without a key never stop early.
+IDLE_PAGES = int(os.environ.get("PDF_IDLE_PAGES", "3"))
+
+
+class DocumentRejected(Exception):
+    """Raised when an upload cannot be parsed within limits; `status_code` is the HTTP status to report."""
+    status_code = 422
+
+
+class DocumentTooLarge(DocumentRejected):
+    status_code = 413
+
+
+class ParseTimeLimitExceeded(DocumentRejected):
+    status_code = 422
+
+
+class UnreadablePDF(DocumentRejected):
+    status_code = 422
+
+
+class ParseLimits:
+    """Upper bounds for parsing a single upload; 0 disables a limit.
+
+    Pages and bytes are checked before any page is interpreted, time is
+    checked between pages, so a runaway document is aborted after at most
+    one more page. A single page that never finishes is caught by the
+    parse executor instead, which kills the worker after `hard_timeout`.
+    """
+
+    def __init__(self, max_bytes: int = 25 * 1024 * 1024, max_pages: int = 500, max_seconds: float = 120,
+                 grace_seconds: float = 10):
+        self.max_bytes = max_bytes
+        self.max_pages = max_pages
+        self.max_seconds = max_seconds
+        self.grace_seconds = grace_seconds
+
+    def check_size(self, size: int):
+        if self.max_bytes and size > self.max_bytes:
+            raise DocumentTooLarge(f"Upload is larger than the {self.max_bytes} byte limit")
+
+    def check_pages(self, pages: int):
+        if self.max_pages and pages > self.max_pages:
+            raise DocumentTooLarge(f"PDF has more than {self.max_pages} pages")
+
+    def deadline(self):
+        return time.monotonic() + self.max_seconds if self.max_seconds else None
+
+    def hard_timeout(self):
+        """Seconds after which a parse is killed rather than left to notice its deadline, or None."""
+        return self.max_seconds + self.grace_seconds if self.max_seconds else None
+
+    def check_time(self, deadline, page_num: int):
+        if deadline is not None and time.monotonic() > deadline:
+            raise ParseTimeLimitExceeded(f"Parsing stopped at page {page_num}: over {self.max_seconds}s")
+
+
+def limits_from_env() -> ParseLimits:
+    """Build the limits configured by PDF_MAX_BYTES / PDF_MAX_PAGES / PDF_MAX_SECONDS / PDF_TIMEOUT_GRACE."""
+    return ParseLimits(
+        max_bytes=int(os.environ.get("PDF_MAX_BYTES", str(25 * 1024 * 1024))),
+        max_pages=int(os.environ.get("PDF_MAX_PAGES", "500")),
+        max_seconds=float(os.environ.get("PDF_MAX_SECONDS", "120")),
+        grace_seconds=float(os.environ.get("PDF_TIMEOUT_GRACE", "10")),
+    )
+
+
+PARSE_LIMITS = limits_from_env()
+
+
+def _accurate_page_texts(pdf_bytes: BytesIO, start: int = 0, stop: int = None):
+    """Yield the text of pages [start, stop) from pdfplumber's full layout pipeline."""
+    import pdfplumber
+    with pdfplumber.open(pdf_bytes) as pdf:
+        for page_num, page in enumerate(pdf.pages[start:stop], start + 1):
+            try:
+                yield page.extract_text()
+            finally:
+                # pdfplumber keeps every page's chars and layout until the PDF closes
+                page.close()
+            logger.debug(f"Processed page {page_num}/{len(pdf.pages)}")
+
+
+def _fast_page_texts(pdf_bytes: BytesIO, start: int = 0, stop: int = None, region: tuple = None,
+                     x_tolerance: float = 3, y_tolerance: float = 3):
+    """Yield each page's text straight from pdfminer's char stream.
+
+    pdfminer runs with layout analysis disabled (laparams=None), so it only
+    reports positioned glyphs. Glyphs are grouped into lines by their top
+    coordinate and ordered left to right, with a space wherever the gap to
+    the previous glyph exceeds `x_tolerance`, which is all the key/value
+    tokens the parsers look for need.
+    """
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+    from pdfminer.converter import PDFPageAggregator
+    from pdfminer.layout import LTChar
+
+    resources = PDFResourceManager(caching=True)
+    device = PDFPageAggregator(resources, laparams=None)
+    interpreter = PDFPageInterpreter(resources, device)
+    pagenos = set(range(start, stop)) if stop is not None else None
+    if pagenos is None and start:
+        pagenos = set(range(start, count_pages(pdf_bytes)))
         pdf_bytes.seek(0)
-        extracted_text = ""
-        
-        with pdfplumber.open(pdf_bytes) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                page_text = page.extract_text()
-                if page_text:
-                    extracted_text += page_text + "\n"
-                logger.info(f"Processed page {page_num}/{len(pdf.pages)}")
-                
-        if not extracted_text:
-            logger.error("No text extracted from PDF")
-            return []
-            
-        return extracted_text.split("\n")
+    for page_num, page in enumerate(PDFPage.get_pages(pdf_bytes, pagenos), start + 1):
+        interpreter.process_page(page)
+        layout = device.get_result()
+        px0, py0, px1, py1 = layout.bbox
+        width, height = px1 - px0, py1 - py0
+        if region:
+            rx0, rtop, rx1, rbottom = (px0 + region[0] * width, region[1] * height,
+                                       px0 + region[2] * width, region[3] * height)
+
+        chars = []
+        for item in layout:
+            if not isinstance(item, LTChar):
+                continue
+            top = py1 - item.y1
+            if region:
+                cx = (item.x0 + item.x1) / 2
+                cy = top + item.height / 2
+                if not (rx0 <= cx <= rx1 and rtop <= cy <= rbottom):
+                    continue
+            chars.append((top, item.x0, item.x1, item.get_text()))
+        chars.sort()
+
+        lines = []
+        line = []
+        line_top = None
+        for char in chars:
+            if line_top is not None and char[0] - line_top > y_tolerance:
+                lines.append(line)
+                line = []
+            if not line:
+                line_top = char[0]
+            line.append(char)
+        if line:
+            lines.append(line)
+
+        page_lines = []
+        for line in lines:
+            line.sort(key=lambda c: c[1])
+            parts = []
+            prev_x1 = None
+            for _, x0, x1, text in line:
+                if prev_x1 is not None and x0 - prev_x1 > x_tolerance and parts[-1] != " " and text != " ":
+                    parts.append(" ")
+                parts.append(text)
+                prev_x1 = x1
+            page_lines.append("".join(parts).strip())
+        yield "\n".join(page_lines)
+        logger.debug(f"Processed page {page_num} (fast)")
+
+
+TEXT_BACKENDS = {
+    "accurate": _accurate_page_texts,
+    "fast": lambda pdf_bytes, start=0, stop=None: _fast_page_texts(pdf_bytes, start, stop, region=TEXT_REGION),
+}
+
+
+def open_pdf(pdf):
+    """A seekable binary stream over `pdf`.
+
+    Accepts bytes, an ingest.Upload (anything with a `stream()` method, which
+    may be memory-mapped) or an open binary stream, which is used as is.
+    """
+    if isinstance(pdf, str):
+        return BytesIO(pdf.encode())
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return BytesIO(pdf)
+    if hasattr(pdf, "stream"):
+        return pdf.stream()
+    return pdf
+
+
+def _stream_size(stream) -> int:
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+def count_pages(pdf_bytes: BytesIO) -> int:
+    """Count the pages of a PDF without interpreting any of them."""
+    from pdfminer.pdfpage import PDFPage
+    pdf_bytes = open_pdf(pdf_bytes)
+    pdf_bytes.seek(0)
+    return sum(1 for _ in PDFPage.get_pages(pdf_bytes))
+
+
+# Elements that end a line of text; table cells are joined with spaces within their row
+_HTML_BLOCK_TAGS = frozenset({"address", "article", "br", "caption", "dd", "div", "dl", "dt", "footer", "form",
+                              "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "ol", "p", "section",
+                              "table", "tbody", "tfoot", "thead", "tr", "ul"})
+_HTML_SKIP_TAGS = frozenset({"script", "style", "head", "title", "noscript"})
+# Response sheet labels, normalized to the "Label :value" spacing of pdfplumber's text
+_HTML_LABEL_RE = re.compile(r"(Question Type|Question ID|Option \d ID|Status|Chosen Option)\s*:\s*")
+# The HTML sheet labels SA answers "Given Answer :"; the PDF text reads "Given<answer>"
+_HTML_GIVEN_RE = re.compile(r"Given Answer\s*:\s*")
+_HTML_CHARSET_RE = re.compile(rb"""charset\s*=\s*["']?([\w.:-]+)""", re.IGNORECASE)
+HTML_CHUNK_BYTES = 64 * 1024
+
+
+class ResponseSheetHTML(HTMLParser):
+    """Streaming converter from response sheet markup to the text layout QuestionScanner reads.
+
+    Each table row (or other block element) becomes one line, its cells
+    separated by spaces; scripts and styles are dropped. `take_text`
+    returns the lines completed so far, so a token is never split between
+    two pieces.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._line = []
+        self._lines = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _HTML_SKIP_TAGS:
+            self._skip += 1
+        elif tag in _HTML_BLOCK_TAGS:
+            self._end_line()
+        elif tag in ("td", "th"):
+            self._line.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in _HTML_SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in _HTML_BLOCK_TAGS:
+            self._end_line()
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._line.append(data)
+
+    def _end_line(self):
+        line = " ".join("".join(self._line).split())
+        self._line = []
+        if line:
+            line = _HTML_GIVEN_RE.sub("Given", _HTML_LABEL_RE.sub(r"\1 :", line))
+            self._lines.append(line + "\n")
+
+    def take_text(self) -> str:
+        text = "".join(self._lines)
+        self._lines = []
+        return text
+
+    def close(self):
+        super().close()
+        self._end_line()
+
+
+def is_html(document) -> bool:
+    """True when the document is markup (an HTML response sheet) rather than a PDF."""
+    stream = open_pdf(document)
+    position = stream.tell()
+    head = stream.read(64)
+    stream.seek(position)
+    return head.lstrip(codecs.BOM_UTF8 + b" \t\r\n").startswith(b"<")
+
+
+def _html_decoder(head: bytes):
+    match = _HTML_CHARSET_RE.search(head)
+    try:
+        encoding = codecs.lookup(match.group(1).decode("ascii")).name if match else "utf-8"
+    except LookupError:
+        encoding = "utf-8"
+    if encoding == "utf-8":
+        encoding = "utf-8-sig"
+    return codecs.getincrementaldecoder(encoding)(errors="replace")
+
+
+def iter_html_text(document, limits: ParseLimits = None, deadline: float = None):
+    """Yield the text of an HTML response sheet piece by piece, as it is read.
+
+    The markup is decoded and parsed HTML_CHUNK_BYTES at a time, so the
+    document is never held whole; `limits` apply as for a PDF, except pages.
+    """
+    limits = limits or PARSE_LIMITS
+    stream = open_pdf(document)
+    limits.check_size(_stream_size(stream))
+    if deadline is None:
+        deadline = limits.deadline()
+    parser = ResponseSheetHTML()
+    decoder = None
+    read = 0
+    for chunk in iter(lambda: stream.read(HTML_CHUNK_BYTES), b""):
+        decoder = decoder or _html_decoder(chunk[:2048])
+        parser.feed(decoder.decode(chunk))
+        read += len(chunk)
+        if deadline is not None and time.monotonic() > deadline:
+            raise ParseTimeLimitExceeded(f"Parsing stopped after {read} bytes of HTML: over {limits.max_seconds}s")
+        yield parser.take_text()
+    if decoder is not None:
+        parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    yield parser.take_text()
+
+
+def extract_html_text(document) -> str:
+    """The whole text of an HTML response sheet, laid out like extract_pdf_text's."""
+    return "".join(iter_html_text(document))
+
+
+def iter_page_texts(pdf_bytes: BytesIO, backend: str = "accurate", start: int = 0, stop: int = None,
+                    limits: ParseLimits = None, deadline: float = None):
+    """Yield the text of pages [start, stop) one at a time, enforcing `limits`.
+
+    Only the page being read is held in memory. `deadline` (time.monotonic)
+    defaults to `limits.max_seconds` from now.
+    """
+    limits = limits or PARSE_LIMITS
+    pdf_bytes = open_pdf(pdf_bytes)
+    limits.check_size(_stream_size(pdf_bytes))
+    if deadline is None:
+        deadline = limits.deadline()
+    pdf_bytes.seek(0)
+    page_num = start
+    try:
+        for page_num, page_text in enumerate(TEXT_BACKENDS[backend](pdf_bytes, start, stop), start + 1):
+            limits.check_pages(page_num)
+            limits.check_time(deadline, page_num)
+            yield page_text or ""
+    except DocumentRejected:
+        raise
+    except Exception as e:
+        raise UnreadablePDF(f"Could not read page {page_num + 1}: {e}") from e
+
+
+def extract_page_texts(pdf_bytes: BytesIO, backend: str = "accurate", start: int = 0, stop: int = None) -> list:
+    """Extract the text of pages [start, stop), one string per page."""
+    return list(iter_page_texts(pdf_bytes, backend, start, stop))
+
+
+def join_page_texts(page_texts: list) -> str:
+    """Join page texts in page order, the way extract_pdf_text does."""
+    return "".join(page_text + "\n" for page_text in page_texts if page_text)
+
+
+def extract_pdf_text(pdf_bytes: BytesIO, backend: str = "accurate") -> str:
+    """Extract the text of every page, one page after another (or of an HTML sheet, see is_html)."""
+    try:
+        if is_html(pdf_bytes):
+            full_text = extract_html_text(pdf_bytes)
+        else:
+            full_text = join_page_texts(extract_page_texts(pdf_bytes, backend))
+        if not full_text:
+            logger.error("Extracted text is empty")
+        else:
+            logger.info(f"Successfully extracted {len(full_text)} characters from PDF")
+
+        return full_text
+    except DocumentRejected:
+        raise
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {e}")
+        return ""
+
+def extract_text_from_pdf_bytes(pdf_bytes: BytesIO) -> list:
+    """Extract text from PDF bytes and return as a list of lines."""
+    extracted_text = extract_pdf_text(pdf_bytes)
+    if not extracted_text:
+        logger.error("No text extracted from PDF")
         return []
 
-def extract_mcq_from_pdf(pdf_bytes: BytesIO):
-    """Extract Multiple Choice Questions from a PDF file."""
+    return extracted_text.split("\n")
+
+MCQ_COLUMNS = ["type", "question_id", "option_1_id", "option_2_id",
+               "option_3_id", "option_4_id", "status", "chosen_option",
+               "chosen_option_id", "given_answer"]
+
+
+def parse_mcq_records(pdf_bytes: BytesIO) -> list:
+    """Parse MCQ responses into a list of MCQRecords (one per question)."""
     logger.info("Processing PDF for MCQs from memory")
-    
-    # Convert to BytesIO if needed
-    if isinstance(pdf_bytes, str):
-        pdf_bytes = BytesIO(pdf_bytes.encode())
-    elif isinstance(pdf_bytes, bytes):
-        pdf_bytes = BytesIO(pdf_bytes)
-        
     parser = JEEExamParser(pdf_bytes)
-    exam_data = parser.parse_exam_pdf()
-    
-    if not exam_data:
-        columns = ["type", "question_id", "option_1_id", "option_2_id",
-                  "option_3_id", "option_4_id", "status", "chosen_option",
-                  "chosen_option_id", "given_answer"]
-        return pd.DataFrame(columns=columns)
-    
-    return pd.DataFrame(exam_data)
+    return parser.parse_exam_pdf()
 
-def extract_sa_from_pdf(pdf_bytes: BytesIO):
-    """Extract Short Answer Questions from a PDF file."""
+
+def parse_sa_records(pdf_bytes: BytesIO) -> list:
+    """Parse short answers into a list of (question_id, answer) SARecords."""
     logger.info("Processing PDF for Short Answers from memory")
-    
-    # Convert to BytesIO if needed
-    if isinstance(pdf_bytes, str):
-        pdf_bytes = BytesIO(pdf_bytes.encode())
-    elif isinstance(pdf_bytes, bytes):
-        pdf_bytes = BytesIO(pdf_bytes)
-        
-    text_lines = extract_text_from_pdf_bytes(pdf_bytes)
-    
+    return parse_sa_lines(extract_text_from_pdf_bytes(pdf_bytes))
+
+
+_GIVEN_RE = re.compile(r"Given(\d+)?")
+_SA_QUESTION_ID_RE = re.compile(r"Question ID :(\d+)")
+
+
+def parse_sa_lines(text_lines: list) -> list:
+    """Pair every "Given" answer with the next Question ID in the text.
+
+    A Given line pairs with the first "Question ID :" on a later line. When
+    no later ID exists it keeps the previous pairing (or None), so the result
+    matches a forward scan from every Given, but in a single pass.
+    """
     given_values = []
+    pending = []
     question_id = None
 
-    for i, line in enumerate(text_lines):
-        match = re.search(r"Given(\d+)?", line)
-        if match:
+    for line in text_lines:
+        if pending and "Question ID :" in line:
+            qid_match = _SA_QUESTION_ID_RE.search(line)
+            if qid_match:
+                question_id = qid_match.group(1)
+                for index in pending:
+                    given_values[index] = SARecord(question_id, given_values[index][1])
+                pending.clear()
+
+        if "Given" in line:
+            match = _GIVEN_RE.search(line)
             value = match.group(1) if match.group(1) else "NULL"
-            for j in range(i + 1, len(text_lines)):
-                qid_match = re.search(r"Question ID :(\d+)", text_lines[j])
-                if qid_match:
-                    question_id = qid_match.group(1)
-                    break
-            given_values.append((question_id, value))
-    
-    df = pd.DataFrame(given_values, columns=["question_id", "answer"])
-    if "question" not in df.columns:
-        df["question"] = ""
-    
-    return df
\ No newline at end of file
+            pending.append(len(given_values))
+            given_values.append(SARecord(question_id, value))
+
+    return given_values
+
+
+def default_idle_pages(question_ids) -> int:
+    """IDLE_PAGES for a parse against an answer key's `question_ids`, else 0.
+
+    Without a key, a run of pages without questions cannot be told apart
+    from the end of the sheet, so such parses read every page.
+    """
+    return IDLE_PAGES if question_ids else 0
+
+
+def needs_accurate_fallback(backend: str, records: dict, expected_questions: int = None) -> bool:
+    """True when a fast-backend parse found too few questions to be trusted."""
+    if backend == "accurate":
+        return False
+    found = len(records["mcq"]) + len(records["sa"])
+    if found == 0 or (expected_questions and found < expected_questions * FAST_MIN_RATIO):
+        logger.warning(f"{backend} text gave {found} questions, expected {expected_questions}; "
+                       f"falling back to accurate extraction")
+        return True
+    return False
+
+
+def records_from_text(full_text: str) -> dict:
+    """Run both question parsers over already extracted text."""
+    if not full_text:
+        logger.error("No text extracted from PDF")
+        return {"mcq": [], "sa": []}
+
+    mcq_records, sa_records = scan_questions(full_text)
+    logger.info(f"Found {len(mcq_records)} MCQ and {len(sa_records)} short answers")
+    return {"mcq": mcq_records, "sa": sa_records}
+
+
+def stream_records(pdf_bytes: BytesIO, backend: str = None, limits: ParseLimits = None, deadline: float = None,
+                   timings: dict = None, question_ids=None, idle_pages: int = 0, pages: dict = None,
+                   page_count: int = None):
+    """Yield ("mcq", MCQRecord) / ("sa", SARecord) pairs while the PDF is read.
+
+    Pages are extracted and scanned one at a time, so neither the page
+    objects nor the whole document text are kept, and a document that
+    breaks `limits` is abandoned as soon as that is known. MCQ records come
+    out in document order, not sorted by question ID.
+
+    Reading also stops early, leaving the remaining pages unread, once
+    every ID in `question_ids` (normally the answer key's) has a complete
+    record, or after `idle_pages` pages in a row without a question marker
+    once the questions have begun. `pages`, when given, is filled with the
+    page count, the pages read and skipped, and what stopped the read
+    ("answer_key", "idle_pages" or None). `page_count` is the page count
+    when the caller has already read it, so the page tree is not walked again.
+
+    Seconds spent reading pages and scanning their text are added to
+    `timings["pdf_extract"]` and `timings["parse_regex"]` when given.
+    HTML documents are handed to stream_html_records.
+    """
+    if is_html(pdf_bytes):
+        yield from stream_html_records(pdf_bytes, limits, deadline, timings)
+        return
+    timings = timings if timings is not None else {}
+    timings.setdefault("pdf_extract", 0.0)
+    timings.setdefault("parse_regex", 0.0)
+    started = time.perf_counter()
+    limits = limits or PARSE_LIMITS
+    pdf_bytes = open_pdf(pdf_bytes)
+    limits.check_size(_stream_size(pdf_bytes))
+    total = page_count
+    if total is None and limits.max_pages:
+        try:
+            total = count_pages(pdf_bytes)
+        except Exception as e:
+            raise UnreadablePDF(f"Could not read the page tree: {e}") from e
+    if total is not None:
+        limits.check_pages(total)
+
+    scanner = QuestionScanner()
+    wanted = set(question_ids) if question_ids else None
+    read = idle = 0
+    stopped = None
+    page_texts = iter_page_texts(pdf_bytes, backend or TEXT_BACKEND, limits=limits, deadline=deadline)
+    for page_text in page_texts:
+        scanned = time.perf_counter()
+        timings["pdf_extract"] += scanned - started
+        read += 1
+        markers = scanner.markers
+        if page_text:
+            mcq_records, sa_records = scanner.feed(page_text + "\n")
+            timings["parse_regex"] += time.perf_counter() - scanned
+            for record in mcq_records:
+                if wanted:
+                    wanted.discard(record.question_id)
+                yield "mcq", record
+            for record in sa_records:
+                if wanted:
+                    wanted.discard(record.question_id)
+                yield "sa", record
+        started = time.perf_counter()
+        idle = idle + 1 if markers and scanner.markers == markers else 0
+        if wanted is not None and (not wanted or wanted == {scanner.open_question()}):
+            stopped = "answer_key"
+        elif idle_pages and idle >= idle_pages:
+            stopped = "idle_pages"
+        if stopped:
+            page_texts.close()
+            break
+    timings["pdf_extract"] += time.perf_counter() - started
+
+    if pages is not None:
+        if total is None:
+            total = read
+            if stopped:
+                try:
+                    total = count_pages(pdf_bytes)
+                except Exception:
+                    pass
+        pages.update(total=total, read=read, skipped=total - read, stopped=stopped)
+        if stopped:
+            logger.info(f"Stopped reading after page {read} of {total} ({stopped})")
+    scanned = time.perf_counter()
+    mcq_records, sa_records = scanner.close()
+    timings["parse_regex"] += time.perf_counter() - scanned
+    for record in mcq_records:
+        yield "mcq", record
+    for record in sa_records:
+        yield "sa", record
+
+
+def stream_html_records(document, limits: ParseLimits = None, deadline: float = None, timings: dict = None):
+    """stream_records for an HTML response sheet: the markup is parsed and scanned as it is read.
+
+    Seconds spent parsing markup and scanning its text are added to
+    `timings["html_extract"]` and `timings["parse_regex"]` when given.
+    """
+    timings = timings if timings is not None else {}
+    timings.setdefault("html_extract", 0.0)
+    timings.setdefault("parse_regex", 0.0)
+    scanner = QuestionScanner()
+    started = time.perf_counter()
+    for text in iter_html_text(document, limits, deadline):
+        scanned = time.perf_counter()
+        timings["html_extract"] += scanned - started
+        if text:
+            mcq_records, sa_records = scanner.feed(text)
+            timings["parse_regex"] += time.perf_counter() - scanned
+            for record in mcq_records:
+                yield "mcq", record
+            for record in sa_records:
+                yield "sa", record
+        started = time.perf_counter()
+    timings["html_extract"] += time.perf_counter() - started
+    scanned = time.perf_counter()
+    mcq_records, sa_records = scanner.close()
+    timings["parse_regex"] += time.perf_counter() - scanned
+    for record in mcq_records:
+        yield "mcq", record
+    for record in sa_records:
+        yield "sa", record
+
+
+def collect_records(stream) -> dict:
+    """Gather stream_records output into the {"mcq": [...], "sa": [...]} parse result."""
+    records = {"mcq": [], "sa": []}
+    for kind, record in stream:
+        records[kind].append(record)
+    records["mcq"].sort(key=MCQRecord.sort_key)
+    logger.info(f"Found {len(records['mcq'])} MCQ and {len(records['sa'])} short answers")
+    return records
+
+
+def parse_all_records(pdf_bytes: BytesIO, expected_questions: int = None, backend: str = None,
+                      limits: ParseLimits = None, question_ids=None, idle_pages: int = None,
+                      page_count: int = None) -> dict:
+    """Extract the text once and run both the MCQ and the SA parser over it.
+
+    With the fast backend, the document is re-read with the accurate backend
+    when no questions, or fewer than FAST_MIN_RATIO of `expected_questions`,
+    are found. Both reads share one `limits.max_seconds` budget.
+
+    HTML response sheets (see is_html) skip text extraction altogether:
+    stream_html_records reads their markup, and no fallback is needed.
+
+    Reading stops once every ID in `question_ids` has been found, or after
+    `idle_pages` pages without questions (see default_idle_pages); "pages" in
+    the result reports the pages read and skipped (see stream_records, None
+    for HTML); `page_count` skips counting the pages again. The result also carries "timings": seconds spent extracting
+    text and scanning it, for the caller to report.
+    """
+    backend = backend or TEXT_BACKEND
+    limits = limits or PARSE_LIMITS
+    deadline = limits.deadline()
+    timings = {}
+    if is_html(pdf_bytes):
+        logger.info("Processing HTML response sheet for MCQs and Short Answers")
+        records = collect_records(stream_html_records(pdf_bytes, limits, deadline, timings))
+        records["timings"] = timings
+        records["pages"] = None
+        return records
+    logger.info(f"Processing PDF for MCQs and Short Answers from memory ({backend} text)")
+    idle_pages = default_idle_pages(question_ids) if idle_pages is None else idle_pages
+    if question_ids and not expected_questions:
+        expected_questions = len(question_ids)
+    pages = {}
+    records = collect_records(stream_records(pdf_bytes, backend, limits, deadline, timings, question_ids,
+                                             idle_pages, pages, page_count))
+    if needs_accurate_fallback(backend, records, expected_questions):
+        records = collect_records(stream_records(pdf_bytes, "accurate", limits, deadline, timings, question_ids,
+                                                 idle_pages, pages, pages.get("total")))
+    records["timings"] = timings
+    records["pages"] = pages
+    return records
+
+
+def extract_mcq_from_pdf(pdf_bytes: BytesIO):
+    """Extract Multiple Choice Questions from a PDF file as a DataFrame (see mcq_frame)."""
+    return mcq_frame(parse_mcq_records(pdf_bytes))
+
+
+def extract_sa_from_pdf(pdf_bytes: BytesIO):
+    """Extract Short Answer Questions from a PDF file as a DataFrame."""
+    import pandas as pd
+    df = pd.DataFrame(parse_sa_records(pdf_bytes), columns=["question_id", "answer"])
+    df["question"] = ""
+    return df
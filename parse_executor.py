@@ -0,0 +1,349 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import models
+
+logger = logging.getLogger(__name__)
+
+
+def _as_document(data):
+    # An ingest.Upload is passed through: it pickles as a file path once spooled
+    if isinstance(data, (bytearray, memoryview)):
+        return bytes(data)
+    if hasattr(data, "getvalue") and not hasattr(data, "stream"):
+        return data.getvalue()
+    return data
+
+
+class ParseQueueFull(Exception):
+    """Raised when more parses are pending than the executor admits."""
+    status_code = 503
+
+
+def warm_parsers():
+    """Parse the embedded sample sheet with every text backend.
+
+    This imports the PDF stack and runs each code path once, so the first
+    real parse in this process does not pay for it. Raises RuntimeError if a
+    backend does not find the sample's questions.
+    """
+    from sample_sheet import SAMPLE_PDF, SAMPLE_MCQ, SAMPLE_SA
+    for backend in models.TEXT_BACKENDS:
+        records = models.parse_all_records(SAMPLE_PDF, backend=backend)
+        if (len(records["mcq"]), len(records["sa"])) != (SAMPLE_MCQ, SAMPLE_SA):
+            raise RuntimeError(f"Warm-up parse with the {backend} backend found "
+                               f"{len(records['mcq'])} MCQ and {len(records['sa'])} SA questions")
+
+
+def _init_worker():
+    # Runs in every worker the pool starts, including replacements for recycled ones
+    try:
+        warm_parsers()
+    except Exception as e:
+        logger.warning(f"Parse worker {os.getpid()} warm-up failed: {e}")
+
+
+def _worker_pid():
+    return os.getpid()
+
+
+def _parse_or_split(data, split_pages: int, **kwargs):
+    """Parse `data` in one piece, or return {"split": pages} for a PDF of at least `split_pages` pages.
+
+    The page count read here is reused by the parse.
+    """
+    if models.is_html(data):
+        return models.parse_all_records(data, **kwargs)
+    # PDF library errors become UnreadablePDF here, in the worker: unpickling
+    # pdfminer's own exceptions would import pdfminer into the API process
+    try:
+        pages = models.count_pages(data)
+    except Exception as e:
+        raise models.UnreadablePDF(f"Could not read the page tree: {e}") from None
+    models.PARSE_LIMITS.check_pages(pages)
+    if split_pages and pages >= split_pages:
+        return {"split": pages}
+    return models.parse_all_records(data, page_count=pages, **kwargs)
+
+
+class ParseExecutor:
+    """Runs the CPU-bound PDF parsers off the event loop.
+
+    In "process" mode parses run in a warm ProcessPoolExecutor, so requests
+    no longer contend for the GIL of the uvicorn worker. Workers are recycled
+    after `max_tasks_per_child` parses to cap memory growth. At most
+    `workers + max_queue` parses may be pending; beyond that `run` raises
+    ParseQueueFull instead of queueing unboundedly. A worker that dies
+    (OOM kill, crash in a PDF library) breaks the whole pool: it is then
+    discarded and `broken` is set until a fresh pool has started. A parse
+    that was alone on the pool when it broke caused the crash and fails
+    with UnreadablePDF; the others are each retried in a one-worker pool of
+    their own, so the crash is pinned on the right document.
+
+    At most `workers` calls are handed to the pool at once, so a call starts
+    as soon as it is submitted, and one that runs past its timeout (the
+    parse time limit plus grace, models.ParseLimits.hard_timeout) can only
+    be stuck inside a single page: its pool's workers are terminated, the
+    pool is replaced and the call fails with ParseTimeLimitExceeded. The
+    other calls killed with it are simply retried on the new pool.
+
+    The PDF is handed over as a single `bytes` object (pickled once into the
+    worker pipe; the worker wraps it in a BytesIO without copying), or as an
+    ingest.Upload, which for spooled uploads sends only the temp file path
+    for the worker to memory-map. Only parsed records come back.
+
+    Documents with at least `parallel_min_pages` pages are split into page
+    ranges that workers extract concurrently (see `parse_document`).
+
+    "thread" mode keeps the old asyncio.to_thread behaviour.
+    """
+
+    def __init__(self, mode: str = "process", workers: int = None,
+                 max_tasks_per_child: int = 200, max_queue: int = 64, parallel_min_pages: int = 24):
+        if mode not in ("process", "thread"):
+            raise ValueError(f"Unknown parse executor mode: {mode}")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.max_tasks_per_child = max_tasks_per_child
+        self.max_queue = max_queue
+        self.parallel_min_pages = parallel_min_pages
+        self._pool = None
+        # Calls in flight per pool, and for a discarded pool how it went:
+        # (terminated by us, calls in flight when it was discarded)
+        self._calls = {}
+        self._fates = {}
+        self._pool_lock = threading.Lock()
+        self._pending = 0
+        self.broken = False
+        self.pool_restarts = 0
+        self.timeouts = 0
+        self._slot_loop = self._slot_semaphore = None
+
+    def _ensure_pool(self):
+        # start() may run in a thread while the first requests are already being served
+        with self._pool_lock:
+            if self._pool is None:
+                # max_tasks_per_child cannot be combined with the fork start method
+                context = multiprocessing.get_context("spawn")
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    max_tasks_per_child=self.max_tasks_per_child or None,
+                    initializer=_init_worker,
+                )
+            return self._pool
+
+    @staticmethod
+    def _kill(pool):
+        # ProcessPoolExecutor cannot cancel a running call; its worker has to go
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+
+    def start(self):
+        """Create the worker pool and start every worker (blocking).
+
+        Each worker warms its parsers (warm_parsers) before taking work; in
+        "thread" mode the parsers are warmed in this process instead.
+        """
+        if self.mode != "process":
+            warm_parsers()
+            return
+        pool = self._ensure_pool()
+        try:
+            pids = {f.result() for f in [pool.submit(_worker_pid) for _ in range(self.workers)]}
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise
+        self.broken = False
+        logger.info(f"Started {len(pids)} parse workers")
+
+    def _discard_pool(self, pool, reason: str = "broke", terminate: bool = False):
+        """Drop `pool` (if still current) so the next parse starts a fresh one."""
+        with self._pool_lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+            self.broken = True
+            self.pool_restarts += 1
+            if self._calls.get(pool):
+                self._fates[pool] = (terminate, self._calls[pool])
+        if terminate:
+            self._kill(pool)
+        pool.shutdown(wait=False, cancel_futures=True)
+        logger.warning(f"Parse worker pool {reason}; starting a new one (restart {self.pool_restarts})")
+
+    def _slots(self) -> asyncio.Semaphore:
+        # One per event loop: asyncio primitives cannot be shared between loops
+        loop = asyncio.get_running_loop()
+        if self._slot_loop is not loop:
+            self._slot_loop, self._slot_semaphore = loop, asyncio.Semaphore(self.workers)
+        return self._slot_semaphore
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, fn, data, timeout: float = None):
+        """Run `fn(data)` in the executor and return its result.
+
+        In "process" mode a call still running after `timeout` seconds
+        (default models.PARSE_LIMITS.hard_timeout()) is killed with its
+        pool and raises ParseTimeLimitExceeded.
+        """
+        data = _as_document(data)
+        if self._pending >= self.workers + self.max_queue:
+            raise ParseQueueFull(f"{self._pending} parses already pending")
+        self._pending += 1
+        try:
+            if self.mode == "thread":
+                return await asyncio.to_thread(fn, data)
+            loop = asyncio.get_running_loop()
+            if timeout is None:
+                timeout = models.PARSE_LIMITS.hard_timeout()
+            while True:
+                async with self._slots():
+                    pool = self._ensure_pool()
+                    self._calls[pool] = self._calls.get(pool, 0) + 1
+                    try:
+                        result = await asyncio.wait_for(loop.run_in_executor(pool, fn, data), timeout)
+                    except asyncio.TimeoutError:
+                        self.timeouts += 1
+                        self._discard_pool(pool, f"had a parse run past {timeout:g}s", terminate=True)
+                        raise models.ParseTimeLimitExceeded(f"Parsing did not finish within {timeout:g}s")
+                    except BrokenProcessPool:
+                        # A dead worker fails every parse on its pool, not only its own
+                        self._discard_pool(pool)
+                        killed, in_flight = self._fates.get(pool, (False, 1))
+                        if killed:
+                            continue
+                        if in_flight == 1:
+                            raise models.UnreadablePDF("The parse worker crashed reading this document")
+                        return await self._run_alone(fn, data, timeout)
+                    finally:
+                        self._release(pool)
+                self.broken = False
+                return result
+        finally:
+            self._pending -= 1
+
+    def _release(self, pool):
+        self._calls[pool] -= 1
+        if not self._calls[pool]:
+            del self._calls[pool]
+            self._fates.pop(pool, None)
+
+    async def _run_alone(self, fn, data, timeout: float = None):
+        # Retry after a crash that hit several calls: in a pool of its own,
+        # a crash can only have been caused by this call's document
+        loop = asyncio.get_running_loop()
+        pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(pool, fn, data), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._kill(pool)
+            raise models.ParseTimeLimitExceeded(f"Parsing did not finish within {timeout:g}s")
+        except BrokenProcessPool:
+            raise models.UnreadablePDF("The parse worker crashed reading this document")
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def parse_document(self, data, expected_questions: int = None, question_ids=None) -> dict:
+        """Parse an upload into MCQ and SA records (models.parse_all_records).
+
+        A document read in one piece stops early once every ID in
+        `question_ids` has been found (see models.stream_records).
+
+        Long PDFs are split into one contiguous page range per worker.
+        The page texts are stitched back in page order before the question
+        scanner runs, so a question that spans a page break still parses.
+        The size limit (models.PARSE_LIMITS) is checked before any work is
+        queued. The first worker to get the document counts its pages,
+        checks the page limit and either parses it outright or hands it back
+        to be split; each range is held to the time limit on its own.
+        Ranges always cover every page. The result also carries "timings",
+        the seconds spent on PDF text extraction and on regex parsing (summed
+        over ranges), and "pages", the pages read and skipped.
+        """
+        data = _as_document(data)
+        limits = models.PARSE_LIMITS
+        limits.check_size(len(data))
+        options = {"expected_questions": expected_questions, "question_ids": question_ids}
+        if self.mode != "process" or not self.parallel_min_pages:
+            return await self.run(partial(models.parse_all_records, **options), data)
+        # Even the page tree of an untrusted upload is only read in a worker
+        records = await self.run(partial(_parse_or_split, split_pages=self.parallel_min_pages, **options), data)
+        if "split" not in records:
+            return records
+        pages = records["split"]
+        free = self.workers + self.max_queue - self._pending
+        chunks = max(1, min(self.workers, pages, free))
+        if chunks < 2:
+            return await self.run(partial(models.parse_all_records, page_count=pages, **options), data)
+
+        logger.info(f"Extracting {pages} pages in {chunks} parallel ranges")
+        backend = models.TEXT_BACKEND
+        timings = {"pdf_extract": 0.0, "parse_regex": 0.0}
+        records = self._scan(await self._timed_ranges(data, pages, chunks, backend, timings), timings)
+        if models.needs_accurate_fallback(backend, records, expected_questions):
+            records = self._scan(await self._timed_ranges(data, pages, chunks, "accurate", timings), timings)
+        records["timings"] = timings
+        records["pages"] = {"total": pages, "read": pages, "skipped": 0, "stopped": None}
+        return records
+
+    async def _timed_ranges(self, data, pages: int, chunks: int, backend: str, timings: dict) -> str:
+        started = time.perf_counter()
+        text = await self._extract_ranges(data, pages, chunks, backend)
+        timings["pdf_extract"] += time.perf_counter() - started
+        return text
+
+    @staticmethod
+    def _scan(text: str, timings: dict) -> dict:
+        started = time.perf_counter()
+        records = models.records_from_text(text)
+        timings["parse_regex"] += time.perf_counter() - started
+        return records
+
+    async def _extract_ranges(self, data, pages: int, chunks: int, backend: str) -> str:
+        bounds = [pages * i // chunks for i in range(chunks + 1)]
+        parts = await asyncio.gather(*[
+            self.run(partial(models.extract_page_texts, backend=backend, start=start, stop=stop), data)
+            for start, stop in zip(bounds, bounds[1:])
+        ])
+        return models.join_page_texts([text for part in parts for text in part])
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "max_tasks_per_child": self.max_tasks_per_child,
+            "max_queue": self.max_queue,
+            "parallel_min_pages": self.parallel_min_pages,
+            "pending": self._pending,
+            "broken": self.broken,
+            "pool_restarts": self.pool_restarts,
+            "timeouts": self.timeouts,
+        }
+
+
+def executor_from_env() -> ParseExecutor:
+    """Build the executor configured by the PARSE_* environment variables."""
+    workers = os.environ.get("PARSE_WORKERS")
+    return ParseExecutor(
+        mode=os.environ.get("PARSE_EXECUTOR", "process"),
+        workers=int(workers) if workers else None,
+        max_tasks_per_child=int(os.environ.get("PARSE_MAX_TASKS_PER_CHILD", "200")),
+        max_queue=int(os.environ.get("PARSE_MAX_QUEUE", "64")),
+        parallel_min_pages=int(os.environ.get("PARSE_PARALLEL_MIN_PAGES", "24")),
+    )
@@ -0,0 +1,138 @@
+import numpy as np
+
+
+class ScoreDistribution:
+    """Counts of submissions per integer score, in a Fenwick (binary indexed) tree.
+
+    `add` and `count_at_most` are O(log R) in the width R of the score
+    range, independent of how many submissions are counted. The range
+    starts at [lo, hi] and widens (one O(R) rebuild) the first time a score
+    falls outside it.
+    """
+
+    def __init__(self, lo: int = -100, hi: int = 400):
+        self.lo = lo
+        self.size = hi - lo + 1
+        self.counts = np.zeros(self.size, dtype=np.int64)
+        self.tree = np.zeros(self.size + 1, dtype=np.int64)
+        self.total = 0
+
+    @classmethod
+    def from_scores(cls, scores, lo: int = -100, hi: int = 400) -> "ScoreDistribution":
+        """Build the tree for a whole column of scores in O(n + R)."""
+        scores = np.asarray(scores, dtype=np.int64)
+        if len(scores):
+            lo, hi = min(lo, int(scores.min())), max(hi, int(scores.max()))
+        dist = cls(lo, hi)
+        dist._build(np.bincount(scores - lo, minlength=dist.size))
+        return dist
+
+    def _build(self, counts: np.ndarray):
+        self.counts = counts.astype(np.int64)
+        tree = np.zeros(self.size + 1, dtype=np.int64)
+        tree[1:] = counts
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+        self.tree = tree
+        self.total = int(counts.sum())
+
+    def _widen(self, score: int):
+        counts = self.counts
+        lo = min(self.lo, score - self.size // 2)
+        hi = max(self.lo + self.size - 1, score + self.size // 2)
+        widened = np.zeros(hi - lo + 1, dtype=np.int64)
+        widened[self.lo - lo:self.lo - lo + self.size] = counts
+        self.lo, self.size = lo, hi - lo + 1
+        self._build(widened)
+
+    def _prefix(self, i: int) -> int:
+        """Number of submissions in the first `i` slots."""
+        count = 0
+        while i > 0:
+            count += int(self.tree[i])
+            i -= i & -i
+        return count
+
+    def add(self, score: int, delta: int = 1):
+        """Count (or, with delta=-1, uncount) one submission with `score`."""
+        if not self.lo <= score < self.lo + self.size:
+            self._widen(score)
+        self.counts[score - self.lo] += delta
+        i = score - self.lo + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+        self.total += delta
+
+    def count_at_most(self, score: int) -> int:
+        """Number of submissions scoring `score` or less."""
+        if score < self.lo:
+            return 0
+        return self._prefix(min(score - self.lo + 1, self.size))
+
+    def rank(self, score: int) -> dict:
+        """Rank (1 = best, ties share a rank) and percentile of `score`.
+
+        The percentile is NTA's: the share of submissions scoring the same
+        or lower, times 100.
+        """
+        at_most = self.count_at_most(score)
+        below = self.count_at_most(score - 1)
+        return {
+            "score": score,
+            "rank": self.total - at_most + 1,
+            "percentile": round(100.0 * at_most / self.total, 7) if self.total else None,
+            "ties": at_most - below,
+            "total_submissions": self.total,
+        }
+
+
+class RankIndex:
+    """Per-exam-date score distributions, updated as submissions are graded.
+
+    Each date keeps the latest score of every sheet, keyed by `sheet`
+    (response_store.sheet_key, a hash of its parsed responses), so a
+    re-graded or re-uploaded sheet, or the PDF and HTML copies of one,
+    moves within the distribution instead of being counted twice.
+    Submissions (by content hash) map to their sheet for `score_of`.
+    `replace` swaps in a whole date at once after a bulk rescore.
+    """
+
+    def __init__(self):
+        self._dates = {}
+
+    def record(self, date: str, submission_id: str, score: int, sheet: str = None):
+        dist, scores, sheets = self._dates.setdefault(date, (ScoreDistribution(), {}, {}))
+        sheet = sheets[submission_id] = sheet or submission_id
+        previous = scores.get(sheet)
+        if previous == score:
+            return
+        if previous is not None:
+            dist.add(previous, -1)
+        dist.add(score)
+        scores[sheet] = score
+
+    def replace(self, date: str, submission_ids: list, scores, sheets: list = None):
+        sheets = list(submission_ids) if sheets is None else list(sheets)
+        by_sheet = dict(zip(sheets, np.asarray(scores, dtype=np.int64).tolist()))
+        self._dates[date] = (ScoreDistribution.from_scores(list(by_sheet.values())), by_sheet,
+                             dict(zip(submission_ids, sheets)))
+
+    def score_of(self, date: str, submission_id: str):
+        entry = self._dates.get(date)
+        if entry is None or submission_id not in entry[2]:
+            return None
+        return entry[1].get(entry[2][submission_id])
+
+    def rank(self, date: str, score: int):
+        """Rank and percentile of `score` among the submissions for `date`, or None."""
+        entry = self._dates.get(date)
+        if entry is None or not entry[0].total:
+            return None
+        return entry[0].rank(score)
+
+    def stats(self) -> dict:
+        return {date: {"submissions": dist.total, "score_range": [dist.lo, dist.lo + dist.size - 1]}
+                for date, (dist, _, _) in self._dates.items()}
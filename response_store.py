@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+import numpy as np
+from scoring import AnswerKeyIndex, decimal_id, score_mcq_groups, score_sa_groups
+
+logger = logging.getLogger(__name__)
+
+
+def _ids(values, blank: int = -1) -> bytes:
+    """Pack decimal ID strings as int64 (`blank` for ""/None); raises ValueError otherwise."""
+    packed = np.empty(len(values), dtype=np.int64)
+    for i, value in enumerate(values):
+        if value is None or value == "":
+            packed[i] = blank
+        else:
+            packed[i] = decimal_id(value)
+            if packed[i] < 0:
+                raise ValueError(f"Cannot store non-decimal ID {value!r}")
+    return packed.tobytes()
+
+
+def _sheet_key(mcq_ids: bytes, mcq_chosen: bytes, sa_ids: bytes, sa_answers: str) -> str:
+    key = hashlib.sha256()
+    for part in (mcq_ids, mcq_chosen, sa_ids, sa_answers.encode()):
+        key.update(len(part).to_bytes(8, "little"))
+        key.update(part)
+    return key.hexdigest()
+
+
+def _packed_responses(records: dict) -> tuple:
+    mcq, sa = records["mcq"], records["sa"]
+    return (_ids([q.question_id for q in mcq]), _ids([q.chosen_option_id for q in mcq]),
+            _ids([q for q, _ in sa]), json.dumps([a for _, a in sa]))
+
+
+def sheet_key(records: dict) -> str:
+    """A hash of a sheet's parsed responses: the same for its PDF and its HTML copy.
+
+    Raises ValueError for records the store cannot pack (non-decimal IDs).
+    """
+    return _sheet_key(*_packed_responses(records))
+
+
+class ResponseStore:
+    """Parsed responses kept per (exam date, submission hash) for rescoring.
+
+    Each submission stores its MCQ question / chosen option IDs and SA
+    question IDs as packed int64 arrays plus the SA answers as a JSON list,
+    about 2 KB per 90-question sheet, next to its latest score. When an answer
+    key is revised, `rescore` regrades every submission for the date in one
+    vectorized pass over the concatenated arrays.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.create_function("sheet_key", 4, _sheet_key, deterministic=True)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS submissions ("
+            " date TEXT NOT NULL, digest TEXT NOT NULL, created REAL NOT NULL,"
+            " mcq_ids BLOB NOT NULL, mcq_chosen BLOB NOT NULL, sa_ids BLOB NOT NULL, sa_answers TEXT NOT NULL,"
+            " correct INTEGER, incorrect INTEGER, skipped INTEGER, dropped INTEGER, total_score INTEGER,"
+            " scored REAL, PRIMARY KEY (date, digest))"
+        )
+
+    @staticmethod
+    def _row(date: str, digest: str, records: dict, summary: dict = None) -> tuple:
+        scores = (None,) * 6
+        if summary is not None:
+            scores = (summary["correct_questions"], summary["incorrect_questions"], summary["skipped_questions"],
+                      summary.get("dropped_questions", 0), summary["total_score"], time.time())
+        return (date, digest, time.time(), *_packed_responses(records), *scores)
+
+    def put(self, digest: str, date: str, records: dict, summary: dict = None) -> bool:
+        """Store a submission's parsed records (and its current score summary)."""
+        return self.put_many([(digest, date, records, summary)]) == 1
+
+    def put_many(self, submissions) -> int:
+        """Store (digest, date, records, summary) tuples; returns how many were stored."""
+        rows = []
+        for digest, date, records, summary in submissions:
+            try:
+                rows.append(self._row(date, digest, records, summary))
+            except ValueError as e:
+                logger.warning(f"Not storing submission {digest[:12]}: {e}")
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR REPLACE INTO submissions VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+            self._db.execute("COMMIT")
+        return len(rows)
+
+    def count(self, date: str) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM submissions WHERE date = ?", (date,)).fetchone()[0]
+
+    def get_score(self, date: str, digest: str):
+        """The stored score summary of one submission, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT correct, incorrect, skipped, dropped, total_score, scored FROM submissions"
+                " WHERE date = ? AND digest = ?", (date, digest)).fetchone()
+        if row is None:
+            return None
+        correct, incorrect, skipped, dropped, total_score, scored = row
+        if scored is None:
+            return None
+        summary = {"correct_questions": correct, "incorrect_questions": incorrect,
+                   "skipped_questions": skipped, "total_questions": correct + incorrect + skipped + dropped,
+                   "total_score": total_score, "scored_at": scored}
+        if dropped:
+            summary["dropped_questions"] = dropped
+        return summary
+
+    def scores(self, date: str = None) -> dict:
+        """Map each date (or just `date`) to the ([digest, ...], [total_score, ...], [sheet_key, ...])
+        of its scored submissions."""
+        query = ("SELECT date, digest, total_score, sheet_key(mcq_ids, mcq_chosen, sa_ids, sa_answers)"
+                 " FROM submissions WHERE scored IS NOT NULL")
+        params = ()
+        if date is not None:
+            query += " AND date = ?"
+            params = (date,)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        by_date = {}
+        for row_date, digest, total_score, sheet in rows:
+            digests, totals, sheets = by_date.setdefault(row_date, ([], [], []))
+            digests.append(digest)
+            totals.append(total_score)
+            sheets.append(sheet)
+        return by_date
+
+    def rescore(self, date: str, index: AnswerKeyIndex) -> dict:
+        """Regrade every stored submission for `date` against `index` and store the new scores."""
+        started = time.perf_counter()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT digest, mcq_ids, mcq_chosen, sa_ids, sa_answers FROM submissions WHERE date = ?",
+                (date,)).fetchall()
+        n = len(rows)
+        digests = [row[0] for row in rows]
+        mcq_ids = [np.frombuffer(row[1], dtype=np.int64) for row in rows]
+        mcq_chosen = np.concatenate([np.frombuffer(row[2], dtype=np.int64) for row in rows] or [[]])
+        sa_ids = [np.frombuffer(row[3], dtype=np.int64) for row in rows]
+        sa_answers = [answer for row in rows for answer in json.loads(row[4])]
+        del rows
+        loaded = time.perf_counter()
+
+        submissions = np.arange(n)
+        mcq_groups = np.repeat(submissions, [len(ids) for ids in mcq_ids])
+        sa_groups = np.repeat(submissions, [len(ids) for ids in sa_ids])
+        scores = (score_mcq_groups(index, np.concatenate(mcq_ids or [[]]).astype(np.int64),
+                                   mcq_chosen.astype(np.int64), mcq_groups, n)
+                  + score_sa_groups(index, np.concatenate(sa_ids or [[]]).astype(np.int64),
+                                    sa_answers, sa_groups, n))
+        scored = time.perf_counter()
+
+        now = time.time()
+        counts = scores.counts.tolist()
+        totals = scores.total_score.tolist()
+        updates = [(*counts[i], totals[i], now, date, digests[i]) for i in range(n)]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "UPDATE submissions SET correct = ?, incorrect = ?, skipped = ?, dropped = ?,"
+                " total_score = ?, scored = ? WHERE date = ? AND digest = ?", updates)
+            self._db.execute("COMMIT")
+        finished = time.perf_counter()
+
+        logger.info(f"Rescored {n} submissions for {date} in {finished - started:.2f}s")
+        return {
+            "date": date,
+            "submissions": n,
+            "load_seconds": round(loaded - started, 3),
+            "score_seconds": round(scored - loaded, 3),
+            "write_seconds": round(finished - scored, 3),
+            "total_seconds": round(finished - started, 3),
+        }
+
+
+def store_from_env():
+    """Open the store at RESPONSE_STORE_PATH, or return None when it is not configured."""
+    path = os.environ.get("RESPONSE_STORE_PATH")
+    return ResponseStore(path) if path else None
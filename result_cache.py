@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the parsers change what they emit, so stale records are not served
+CACHE_VERSION = 2
+
+
+def content_hash(data: bytes) -> str:
+    """Hex SHA-256 of an uploaded document."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ParsedResultCache:
+    """Content-addressed cache of parsed question records.
+
+    Entries are keyed on the hash of the PDF bytes and hold the parser
+    output (not scores), so a re-upload can be rescored against any answer
+    key without touching pdfplumber. Records are stored JSON-encoded: the
+    memory tier is an LRU bounded by `max_bytes`, and an optional SQLite
+    file under `cache_dir` keeps entries across restarts and workers.
+
+    `get` and `put` are coroutines: the memory tier is used inline, the
+    SQLite tier in a thread (under its own lock), so a slow disk holds up
+    only the requests that need it.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, cache_dir: str = None):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(cache_dir, "parsed_results.sqlite3"),
+                                       check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS parsed (key TEXT PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL)"
+            )
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(digest: str) -> str:
+        return f"v{CACHE_VERSION}:{digest}"
+
+    async def get(self, digest: str):
+        """Return the cached records for `digest`, or None."""
+        key = self._key(digest)
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(blob)
+        if self._db is not None:
+            blob = await asyncio.to_thread(self._read_disk, key)
+            if blob is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, blob)
+                return json.loads(blob)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def put(self, digest: str, records):
+        """Store parsed records for `digest` in every tier."""
+        key = self._key(digest)
+        blob = json.dumps(records, separators=(",", ":")).encode()
+        with self._lock:
+            self._remember(key, blob)
+        if self._db is not None:
+            await asyncio.to_thread(self._write_disk, key, blob)
+
+    def _read_disk(self, key: str):
+        with self._db_lock:
+            row = self._db.execute("SELECT value FROM parsed WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _write_disk(self, key: str, blob: bytes):
+        with self._db_lock:
+            self._db.execute("INSERT OR REPLACE INTO parsed (key, value, created) VALUES (?, ?, ?)",
+                             (key, blob, time.time()))
+
+    def _remember(self, key: str, blob: bytes):
+        if len(blob) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = blob
+        self._bytes += len(blob)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "disk_tier": self._db is not None,
+        }
+
+
+def cache_from_env() -> ParsedResultCache:
+    """Build the cache configured by RESULT_CACHE_BYTES / RESULT_CACHE_DIR."""
+    return ParsedResultCache(
+        max_bytes=int(os.environ.get("RESULT_CACHE_BYTES", str(64 * 1024 * 1024))),
+        cache_dir=os.environ.get("RESULT_CACHE_DIR") or None,
+    )
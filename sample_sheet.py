@@ -0,0 +1,64 @@
+"""A tiny response sheet PDF, built in code, for warming up the parsers.
+
+`build_pdf` writes a minimal uncompressed PDF (one Helvetica text stream per
+page) without any PDF library, so importing this module costs nothing.
+`SAMPLE_PDF` is a one-page sheet with one MCQ and one SA question laid out
+like a real response sheet; parsing it exercises both text backends and
+both question parsers.
+"""
+
+
+def build_pdf(pages: list) -> bytes:
+    """A PDF with one page per list of text lines."""
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    pages_id = 2 + 2 * len(pages)
+    page_ids = []
+    for lines in pages:
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for line in lines:
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(f"({escaped}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R"
+                       b" /Resources << /Font << /F1 1 0 R >> >> >>" % (pages_id, len(objects)))
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects.append(b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(objects), xref)
+    return bytes(out)
+
+
+SAMPLE_LINES = [
+    "Q.1 Sample question",
+    "Question Type : MCQ",
+    "Question ID :1001",
+    "Option 1 ID :2001",
+    "Option 2 ID :2002",
+    "Option 3 ID :2003",
+    "Option 4 ID :2004",
+    "Status :Answered",
+    "Chosen Option :2",
+    "Q.2 Sample numeric question",
+    "Given42",
+    "Question Type : SA",
+    "Question ID :1002",
+    "Status :Answered",
+]
+
+SAMPLE_PDF = build_pdf([SAMPLE_LINES])
+# What models.parse_all_records must find in SAMPLE_PDF
+SAMPLE_MCQ = 1
+SAMPLE_SA = 1
@@ -0,0 +1,380 @@
+import re
+import numpy as np
+
+CORRECT_POINTS = 4
+INCORRECT_POINTS = -1
+DROPPED_POINTS = 4
+SCORING_SYSTEM = "+4 for correct, -1 for incorrect, 0 for skipped, +4 for dropped (answered or not)"
+
+CORRECT = "Correct"
+INCORRECT = "Incorrect"
+NOT_ANSWERED = "Not Answered"
+DROPPED = "Dropped"
+
+# Status codes used in the vectorized arrays, indexing into STATUS_NAMES
+STATUS_NAMES = np.array([CORRECT, INCORRECT, NOT_ANSWERED, DROPPED], dtype=object)
+_CORRECT, _INCORRECT, _NOT_ANSWERED, _DROPPED = range(4)
+_POINTS = np.array([CORRECT_POINTS, INCORRECT_POINTS, 0, DROPPED_POINTS])
+
+
+def _as_str_array(values) -> np.ndarray:
+    """Convert a column of values to a numpy unicode array ('' for missing)."""
+    return np.array(["" if v is None else str(v) for v in values], dtype=str).reshape(-1)
+
+
+def decimal_id(value) -> int:
+    """The integer for a canonical decimal ID string ("123", not "0123" or " 123"), else -2.
+
+    Stored responses keep IDs as non-negative integers (-1 for blank); -2
+    never matches one, so keys with non-canonical IDs or answers grade
+    exactly as the string comparison does.
+    """
+    s = value if isinstance(value, str) else "" if value is None else str(value)
+    if s.isdigit() and s.isascii() and (s == "0" or s[0] != "0"):
+        return int(s)
+    return -2
+
+
+# Key values that award full marks to everyone (NTA publishes both spellings)
+DROPPED_ANSWERS = ("DROP", "BONUS")
+# NTA option IDs are long decimal numbers; short answers such as "1,000" are not split
+_OPTION_ID = re.compile(r"^[1-9]\d{5,}$")
+_THOUSANDS = re.compile(r"^-?\d{1,3}(?:,\d{3})+(?:\.\d+)?$")
+_NUMERIC_RANGE = re.compile(r"^(-?\d+(?:\.\d+)?)\s*(?:-|to)\s*(-?\d+(?:\.\d+)?)$", re.IGNORECASE)
+
+
+def _to_float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def _accepted_answers(value) -> list:
+    """Split a key value into its accepted answers.
+
+    A JSON list, or option IDs joined with "," or "|", accepts any of them
+    (questions NTA resolved with more than one correct option); anything
+    else, including a short answer written with a thousands separator, is
+    a single answer.
+    """
+    if isinstance(value, (list, tuple)):
+        parts = [str(v).strip() for v in value]
+    else:
+        value = "" if value is None else str(value).strip()
+        parts = [value]
+        for sep in ("|", ","):
+            if sep in value:
+                split = [part.strip() for part in value.split(sep)]
+                if all(_OPTION_ID.match(part) for part in split):
+                    parts = split
+                break
+    return parts or [""]
+
+
+def _numeric_bounds(value: str):
+    """(low, high) for a numeric answer ("12", "2.5", "1,000") or range ("1.2-1.4", "5 to 6"), else NaNs."""
+    if _THOUSANDS.match(value):
+        value = value.replace(",", "")
+    match = _NUMERIC_RANGE.match(value)
+    if match:
+        return float(match.group(1)), float(match.group(2))
+    number = _to_float(value) if value else np.nan
+    return number, number
+
+
+class AnswerKeyIndex:
+    """An answer key compiled for vectorized lookups.
+
+    Question IDs are held in a sorted array so that a whole column of
+    responses can be joined against the key with a single searchsorted;
+    the decimal IDs are also interned as int64 for the response store.
+    Per question the index keeps the first accepted answer (string, lower
+    case, int64 option ID and numeric low/high bounds for short answers)
+    and a DROP/BONUS flag; further accepted answers live in the small
+    `alt_*` arrays. Short answers within `sa_tolerance` of a numeric key
+    (or inside a key range) count as correct.
+
+    Everything is plain numpy arrays (see `arrays` / `from_arrays`), so a
+    compiled index can be written to a file and memory-mapped read-only by
+    every worker process.
+    """
+
+    ARRAYS = ("ids", "answers", "accepted", "accepted_lower", "dropped", "sa_low", "sa_high",
+              "int_ids", "int_order", "int_answers",
+              "alt_pos", "alt_answers", "alt_lower", "alt_int", "alt_num")
+
+    def __init__(self, answer_key: list, id_field: str = "id", answer_field: str = "correct_option",
+                 sa_tolerance: float = 0.0):
+        ids = _as_str_array([item[id_field] for item in answer_key])
+        raw = [item[answer_field] for item in answer_key]
+        answers = np.char.strip(_as_str_array([",".join(map(str, v)) if isinstance(v, (list, tuple)) else v
+                                               for v in raw]))
+        order = np.argsort(ids, kind="stable")
+        size = len(ids)
+        accepted = [_accepted_answers(raw[i]) for i in order]
+
+        arrays = {}
+        # Pad with one blank slot so positions from an empty key stay indexable
+        arrays["ids"] = np.append(ids[order], "")
+        arrays["answers"] = np.append(answers[order], "")
+        arrays["accepted"] = _as_str_array([parts[0] for parts in accepted] + [""])
+        arrays["accepted_lower"] = np.char.lower(arrays["accepted"])
+        arrays["dropped"] = np.isin(np.char.upper(arrays["accepted"]), DROPPED_ANSWERS)
+        bounds = [_numeric_bounds(parts[0]) for parts in accepted] + [(np.nan, np.nan)]
+        arrays["sa_low"] = np.array([low for low, _ in bounds], dtype=np.float64)
+        arrays["sa_high"] = np.array([high for _, high in bounds], dtype=np.float64)
+
+        int_ids = np.array([decimal_id(v) for v in arrays["ids"][:size]], dtype=np.int64)
+        # Stable, so duplicate IDs resolve to the same entry as the string lookup
+        int_order = np.argsort(int_ids, kind="stable")
+        arrays["int_ids"] = int_ids[int_order]
+        arrays["int_order"] = int_order.astype(np.int64)
+        arrays["int_answers"] = np.array([decimal_id(v) for v in arrays["accepted"]], dtype=np.int64)
+
+        alternatives = [(pos, answer) for pos, parts in enumerate(accepted) for answer in parts[1:]]
+        arrays["alt_pos"] = np.array([pos for pos, _ in alternatives], dtype=np.int64)
+        arrays["alt_answers"] = _as_str_array([answer for _, answer in alternatives])
+        arrays["alt_lower"] = np.char.lower(arrays["alt_answers"])
+        arrays["alt_int"] = np.array([decimal_id(a) for _, a in alternatives], dtype=np.int64)
+        arrays["alt_num"] = np.array([_to_float(a) if a else np.nan for _, a in alternatives], dtype=np.float64)
+        self._set(arrays, sa_tolerance)
+
+    def _set(self, arrays: dict, sa_tolerance: float):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.size = len(self.ids) - 1
+        self.sa_tolerance = sa_tolerance
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, sa_tolerance: float = 0.0) -> "AnswerKeyIndex":
+        """Wrap already compiled arrays (e.g. memory-mapped views) without copying them."""
+        index = cls.__new__(cls)
+        index._set(arrays, sa_tolerance)
+        return index
+
+    def arrays(self) -> dict:
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def __len__(self):
+        return self.size
+
+    def lookup(self, question_ids: np.ndarray):
+        """Return (found mask, key positions) for an array of question IDs."""
+        pos = np.searchsorted(self.ids[:self.size], question_ids)
+        pos[pos >= self.size] = self.size
+        found = (self.ids[pos] == question_ids) & (pos < self.size)
+        return found, pos
+
+    def lookup_int(self, question_ids: np.ndarray):
+        """`lookup` for int64 question IDs (as kept by the response store)."""
+        if not self.size:
+            return np.zeros(len(question_ids), dtype=bool), np.zeros(len(question_ids), dtype=np.intp)
+        slot = np.searchsorted(self.int_ids, question_ids)
+        slot[slot >= self.size] = self.size - 1
+        found = self.int_ids[slot] == question_ids
+        pos = np.where(found, self.int_order[slot], self.size)
+        return found, pos
+
+    def _matches_alternative(self, pos: np.ndarray, values: np.ndarray, alt_values: np.ndarray) -> np.ndarray:
+        matched = np.zeros(len(pos), dtype=bool)
+        # Only a handful of questions ever have more than one accepted answer
+        for alt_pos, alt_value in zip(self.alt_pos.tolist(), alt_values.tolist()):
+            matched |= (pos == alt_pos) & (values == alt_value)
+        return matched
+
+    def mcq_correct(self, pos: np.ndarray, chosen: np.ndarray) -> np.ndarray:
+        """Chosen option ID strings equal to an accepted option ID."""
+        return (chosen == self.accepted[pos]) | self._matches_alternative(pos, chosen, self.alt_answers)
+
+    def mcq_correct_int(self, pos: np.ndarray, chosen: np.ndarray) -> np.ndarray:
+        """mcq_correct for int64 option IDs."""
+        return (chosen == self.int_answers[pos]) | self._matches_alternative(pos, chosen, self.alt_int)
+
+    def sa_correct(self, pos: np.ndarray, given: np.ndarray, numbers: np.ndarray,
+                   case_sensitive: bool = False, lowered: np.ndarray = None) -> np.ndarray:
+        """Short answers equal to an accepted answer, or numerically within tolerance/range.
+
+        `numbers` holds the answers as floats (NaN when not numeric);
+        `lowered` may pass np.char.lower(given) when already computed.
+        """
+        if case_sensitive:
+            correct = given == self.accepted[pos]
+            correct |= self._matches_alternative(pos, given, self.alt_answers)
+        else:
+            if lowered is None:
+                lowered = np.char.lower(given)
+            correct = lowered == self.accepted_lower[pos]
+            correct |= self._matches_alternative(pos, lowered, self.alt_lower)
+        with np.errstate(invalid="ignore"):
+            correct |= ((numbers >= self.sa_low[pos] - self.sa_tolerance)
+                        & (numbers <= self.sa_high[pos] + self.sa_tolerance))
+            for alt_pos, alt_num in zip(self.alt_pos.tolist(), self.alt_num.tolist()):
+                correct |= (pos == alt_pos) & (np.abs(numbers - alt_num) <= self.sa_tolerance)
+        return correct
+
+
+def build_summary(correct: int, incorrect: int, skipped: int, dropped: int, total_score: int,
+                  total_questions: int = None) -> dict:
+    """Build a `score_summary` block from aggregate counts."""
+    if total_questions is None:
+        total_questions = correct + incorrect + skipped + dropped
+    summary = {
+        "correct_questions": correct,
+        "incorrect_questions": incorrect,
+        "skipped_questions": skipped,
+        "total_questions": total_questions,
+        "total_score": total_score,
+        "scoring_system": SCORING_SYSTEM,
+    }
+    if dropped:
+        summary["dropped_questions"] = dropped
+    return summary
+
+
+class ScoreResult:
+    """Per-question status codes/points arrays plus the aggregate counts."""
+
+    __slots__ = ("question_ids", "given", "found", "correct_answers", "codes", "points",
+                 "correct", "incorrect", "skipped", "dropped", "total_score")
+
+    def __init__(self, question_ids, given, found, correct_answers, codes):
+        self.question_ids = question_ids
+        self.given = given
+        self.found = found
+        self.correct_answers = correct_answers
+        self.codes = codes
+        self.points = _POINTS[codes]
+        counts = np.bincount(codes[found], minlength=len(STATUS_NAMES))
+        self.correct, self.incorrect, self.skipped, self.dropped = (int(c) for c in counts)
+        self.total_score = int(self.points[found].sum())
+
+    @property
+    def status(self) -> np.ndarray:
+        return STATUS_NAMES[self.codes]
+
+    def summary(self, total_questions: int = None) -> dict:
+        """Build the `score_summary` block returned by the endpoints."""
+        return build_summary(self.correct, self.incorrect, self.skipped, self.dropped,
+                             self.total_score, total_questions)
+
+    def records(self, include_type: bool = False) -> list:
+        """Per-question results for questions present in the answer key."""
+        found = self.found
+        rows = zip(self.question_ids[found].tolist(), self.given[found].tolist(),
+                   self.correct_answers[found].tolist(), self.status[found].tolist(),
+                   self.points[found].tolist())
+        if include_type:
+            return [{"type": "sa", "question_id": q, "given_answer": g, "correct_answer": c,
+                     "status": s, "points": p} for q, g, c, s, p in rows]
+        return [{"question_id": q, "given_answer": g, "correct_answer": c, "status": s, "points": p}
+                for q, g, c, s, p in rows]
+
+
+def combined_summary(*results: ScoreResult) -> dict:
+    """Sum several ScoreResults (e.g. MCQ and SA) into one score_summary."""
+    return build_summary(
+        sum(r.correct for r in results),
+        sum(r.incorrect for r in results),
+        sum(r.skipped for r in results),
+        sum(r.dropped for r in results),
+        sum(r.total_score for r in results),
+    )
+
+
+def _status_codes(index: AnswerKeyIndex, pos, skipped, correct) -> np.ndarray:
+    return np.select(
+        [index.dropped[pos], skipped, correct],
+        [_DROPPED, _NOT_ANSWERED, _CORRECT],
+        default=_INCORRECT,
+    ).astype(np.intp)
+
+
+def _grade(index: AnswerKeyIndex, question_ids, given, skipped, correct, pos, found):
+    codes = _status_codes(index, pos, skipped, correct)
+    return ScoreResult(question_ids, given, found, index.answers[pos], codes)
+
+
+def score_mcq(index: AnswerKeyIndex, question_ids, chosen_option_ids) -> ScoreResult:
+    """Grade MCQ responses: the chosen option ID must equal an accepted option ID of the key."""
+    question_ids = _as_str_array(question_ids)
+    chosen = _as_str_array(chosen_option_ids)
+    found, pos = index.lookup(question_ids)
+    skipped = chosen == ""
+    correct = index.mcq_correct(pos, chosen)
+    return _grade(index, question_ids, chosen, skipped, correct, pos, found)
+
+
+def _numbers(values) -> np.ndarray:
+    return np.array([_to_float(v) if v else np.nan for v in values], dtype=np.float64)
+
+
+def score_sa(index: AnswerKeyIndex, question_ids, answers, case_sensitive: bool = False) -> ScoreResult:
+    """Grade short answers; blank or NULL answers count as skipped."""
+    question_ids = _as_str_array(question_ids)
+    given = np.char.strip(_as_str_array(answers))
+    skipped = (given == "") | (np.char.upper(given) == "NULL")
+    found, pos = index.lookup(question_ids)
+    correct = index.sa_correct(pos, given, _numbers(given.tolist()), case_sensitive)
+    return _grade(index, question_ids, given, skipped, correct, pos, found)
+
+
+class GroupScores:
+    """Score totals for many submissions at once, one row per group.
+
+    `counts` has one column per status code (see STATUS_NAMES) and
+    `total_score` holds each group's points; only questions found in the
+    key count, as in ScoreResult.
+    """
+
+    __slots__ = ("counts", "total_score")
+
+    def __init__(self, counts: np.ndarray, total_score: np.ndarray):
+        self.counts = counts
+        self.total_score = total_score
+
+    @classmethod
+    def from_codes(cls, codes: np.ndarray, found: np.ndarray, groups: np.ndarray, n_groups: int):
+        groups, codes = groups[found], codes[found]
+        counts = np.bincount(groups * len(STATUS_NAMES) + codes,
+                             minlength=n_groups * len(STATUS_NAMES)).reshape(n_groups, len(STATUS_NAMES))
+        total = np.bincount(groups, weights=_POINTS[codes], minlength=n_groups).astype(np.int64)
+        return cls(counts, total)
+
+    def __add__(self, other: "GroupScores") -> "GroupScores":
+        return GroupScores(self.counts + other.counts, self.total_score + other.total_score)
+
+    def summary(self, group: int) -> dict:
+        correct, incorrect, skipped, dropped = (int(c) for c in self.counts[group])
+        return build_summary(correct, incorrect, skipped, dropped, int(self.total_score[group]))
+
+
+def score_mcq_groups(index: AnswerKeyIndex, question_ids: np.ndarray, chosen_option_ids: np.ndarray,
+                     groups: np.ndarray, n_groups: int) -> GroupScores:
+    """score_mcq over the int64 responses of many submissions; `groups` maps rows to submissions.
+
+    A chosen option ID of -1 means not answered.
+    """
+    found, pos = index.lookup_int(question_ids)
+    skipped = chosen_option_ids == -1
+    correct = index.mcq_correct_int(pos, chosen_option_ids)
+    return GroupScores.from_codes(_status_codes(index, pos, skipped, correct), found, groups, n_groups)
+
+
+def score_sa_groups(index: AnswerKeyIndex, question_ids: np.ndarray, answers, groups: np.ndarray,
+                    n_groups: int, case_sensitive: bool = False) -> GroupScores:
+    """score_sa over the short answers of many submissions; `groups` maps rows to submissions.
+
+    Answers repeat heavily across a cohort, so they are normalized once per
+    distinct value and expanded back with an index array.
+    """
+    distinct = {}
+    inverse = np.fromiter((distinct.setdefault(a, len(distinct)) for a in answers), dtype=np.intp,
+                          count=len(answers))
+    values = [("" if a is None else str(a)).strip() for a in distinct]
+    skipped = np.array([v == "" or v.upper() == "NULL" for v in values], dtype=bool)[inverse]
+    found, pos = index.lookup_int(question_ids)
+    given = np.array(values, dtype=str)[inverse]
+    lowered = None if case_sensitive else np.array([v.lower() for v in values], dtype=str)[inverse]
+    correct = index.sa_correct(pos, given, _numbers(values)[inverse], case_sensitive, lowered)
+    return GroupScores.from_codes(_status_codes(index, pos, skipped, correct), found, groups, n_groups)
@@ -0,0 +1,50 @@
+import asyncio
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight task.
+
+    The first caller for a key starts `fn()`; everyone arriving while it
+    runs awaits the same task and gets the same result or exception. A
+    waiter that is cancelled only stops waiting; the shared task is
+    cancelled once no waiters are left.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.ensure_future(fn())
+            call = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        task = call[0]
+        call[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and call[1] == 1:
+                self._forget(key, task)
+                task.cancel()
+            raise
+        finally:
+            call[1] -= 1
+
+    def _forget(self, key, task):
+        call = self._calls.get(key)
+        if call is not None and call[0] is task:
+            del self._calls[key]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        return {"started": self.started, "coalesced": self.coalesced, "in_flight": self.in_flight}